@@ -0,0 +1,163 @@
+"""
+NumPy engine that solves many small K_DominationGame / AsymmetricIDSGame instances at once
+
+All instances are stacked into one global node index space (instance b owns a contiguous
+range of indices), with a padded adjacency matrix whose empty slots point to a sentinel
+node that is never a dominator. Each step computes the utility of "True" for every player
+of every instance in a few vectorized passes ( the utility of "False" is always 0 ),
+then moves a conflict-free set of unstable players simultaneously.
+
+Conflict-free selection: every unstable player draws a random priority and moves only if
+its priority is the largest among the unstable players within distance 2 (the interaction
+radius of the domination games). Players that move in the same step therefore never
+influence each other's utilities, so a step is equivalent to some sequential order of
+best-response moves, and the equilibria are those reached by bestResponseSolver.
+"""
+from typing import List, Optional, Union
+
+import numpy as np
+
+from graph_games import K_DominationGame, AsymmetricIDSGame
+
+DominationGame = Union[K_DominationGame, AsymmetricIDSGame]
+
+
+class DominationGameBatch:
+    """ stacked array state of a batch of K_DominationGame / AsymmetricIDSGame instances """
+
+    def __init__(self, games: List[DominationGame], seed: Optional[int] = None) -> None:
+        self.games = games
+        self.rng = np.random.default_rng(seed)
+        # global index of each player, instance b owns [start[b], start[b+1])
+        self.labels = [list(game.players) for game in games]
+        sizes = np.array([len(labels) for labels in self.labels], dtype=np.int64)
+        self.start = np.concatenate(([0], np.cumsum(sizes)))
+        total = int(self.start[-1])
+        self.sentinel = total
+        max_deg = max((game.graph.degree(p) for game in games for p in game.players), default=0)
+
+        self.instance = np.repeat(np.arange(len(games)), sizes)
+        self.nbr = np.full((total + 1, max(max_deg, 1)), self.sentinel, dtype=np.int64)
+        self.deg = np.zeros(total + 1, dtype=np.int64)
+        self.dom = np.zeros(total + 1, dtype=bool)
+        # per player game parameters
+        self.k = np.zeros(total, dtype=np.int64)
+        self.alpha = np.zeros(total)
+        self.beta = np.zeros(total)
+        self.gamma = np.zeros(total)
+        self.ids = np.zeros(total, dtype=bool)
+
+        for b, (game, labels) in enumerate(zip(games, self.labels)):
+            offset = self.start[b]
+            index = {p: offset + i for i, p in enumerate(labels)}
+            for i, p in enumerate(labels):
+                row = [index[n] for n in game.graph.neighbors(p)]
+                self.nbr[offset + i, :len(row)] = row
+                self.deg[offset + i] = len(row)
+                self.dom[offset + i] = p in game.dominators
+            block = slice(offset, offset + len(labels))
+            self.k[block] = game.k
+            self.alpha[block] = game.alpha
+            self.beta[block] = game.beta
+            if isinstance(game, AsymmetricIDSGame):
+                self.ids[block] = True
+                self.gamma[block] = game.gamma
+        self.valid = self.nbr[:total] != self.sentinel
+        self.move_count = np.zeros(len(games), dtype=np.int64)
+        self.steps = 0
+
+    def numDominator(self) -> np.ndarray:
+        """ number of dominator neighbors of every player (and 0 for the sentinel) """
+        return self.dom[self.nbr].sum(axis=1)
+
+    def dominatorUtil(self, num_dom: np.ndarray) -> np.ndarray:
+        """ utility of choosing "True" for every player, given the current numDominator """
+        total = self.sentinel
+        dom = self.dom[:total]
+        nbr = self.nbr[:total]
+        # dominator count of each neighbor once the player itself is a dominator
+        nbr_count = num_dom[nbr] + (~dom)[:, None]
+        nbr_dom = self.dom[nbr]
+
+        # K-domination: gain alpha for each non-dominator neighbor with <= k dominators
+        kdom = self.alpha * (self.valid & ~nbr_dom & (nbr_count <= self.k[:, None])).sum(axis=1) - self.beta
+        kdom = np.where(self.deg[:total] < self.k, self.alpha, kdom)
+
+        # asymmetric IDS: gain alpha for each node in the closed neighborhood dominated exactly once,
+        # penalty gamma for each dominator neighbor with higher or equal degree
+        once = (self.valid & (nbr_count + nbr_dom == 1)).sum(axis=1) + (num_dom[:total] == 0)
+        conflicts = (self.valid & nbr_dom & (self.deg[nbr] >= self.deg[:total, None])).sum(axis=1)
+        ids = self.alpha * once - self.beta - self.gamma * conflicts
+        return np.where(self.ids, ids, kdom)
+
+    def unstable(self) -> np.ndarray:
+        """ boolean mask of the players that are not best-responding """
+        util = self.dominatorUtil(self.numDominator())
+        dom = self.dom[:self.sentinel]
+        # best response is "True" iff its utility is > 0, ties go to "False" (utility 0)
+        return (dom & (util < 0)) | (~dom & (util > 0))
+
+    def step(self) -> int:
+        """ move a conflict-free set of unstable players to their best response, return the number of moves """
+        unstable = self.unstable()
+        if not unstable.any():
+            return 0
+        total = self.sentinel
+        priority = np.full(total + 1, -1.0)
+        priority[:total][unstable] = self.rng.random(int(unstable.sum()))
+        # largest priority within distance 1, then within distance 2
+        ball = np.maximum(priority, priority[self.nbr].max(axis=1))
+        ball[total] = -1.0
+        ball = np.maximum(ball, ball[self.nbr].max(axis=1))
+        movers = unstable & (priority[:total] == ball[:total])
+        # the best response of an unstable player is the opposite action
+        self.dom[:total][movers] = ~self.dom[:total][movers]
+        self.move_count += np.bincount(self.instance[movers], minlength=len(self.games))
+        self.steps += 1
+        return int(movers.sum())
+
+    def solve(self, max_steps: Optional[int] = None) -> np.ndarray:
+        """
+        run synchronous steps until every instance is in a Nash Equilibrium
+        Return:
+            the number of iterations of each instance, counted like bestResponseSolver
+            (number of moves, plus the final iteration that confirms the equilibrium)
+        """
+        while max_steps is None or self.steps < max_steps:
+            if self.step() == 0:
+                break
+        return self.move_count + 1
+
+    def dominationSetCardinality(self) -> np.ndarray:
+        return np.bincount(self.instance[self.dom[:self.sentinel]], minlength=len(self.games))
+
+    def checkDomination(self) -> np.ndarray:
+        """ per instance, whether every non-dominator has at least k dominator neighbors """
+        total = self.sentinel
+        violation = ~self.dom[:total] & (self.numDominator()[:total] < self.k)
+        return np.bincount(self.instance[violation], minlength=len(self.games)) == 0
+
+    def checkIndependence(self) -> np.ndarray:
+        """ per instance, whether no two dominators are adjacent """
+        total = self.sentinel
+        violation = self.dom[:total] & self.dom[self.nbr[:total]].any(axis=1)
+        return np.bincount(self.instance[violation], minlength=len(self.games)) == 0
+
+    def writeBack(self) -> None:
+        """ copy the batch state back into the Game objects """
+        for b, (game, labels) in enumerate(zip(self.games, self.labels)):
+            offset = self.start[b]
+            game.setProfile({p: bool(self.dom[offset + i]) for i, p in enumerate(labels)})
+
+
+def batchBestResponseSolver(games: List[DominationGame], seed: Optional[int] = None) -> List[int]:
+    """
+    solve a batch of K_DominationGame / AsymmetricIDSGame instances with DominationGameBatch,
+    the equilibria are written back into the games
+    Return:
+        the iterations used by each game, counted like bestResponseSolver
+    """
+    batch = DominationGameBatch(games, seed)
+    move_counts = batch.solve()
+    batch.writeBack()
+    return move_counts.tolist()
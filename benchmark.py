@@ -0,0 +1,287 @@
+"""
+Benchmarks for graph generation, utility evaluation and solving
+
+    python benchmark.py generators                  # old vs new Watts-Strogatz generator
+    python benchmark.py run -o new.json [--full]    # micro and macro benchmarks, saved as JSON
+    python benchmark.py compare old.json new.json   # flag regressions between two runs
+    python benchmark.py schedulers                  # move counts and time of the move orders
+"""
+import json
+import platform
+import sys
+import time
+import random
+from typing import Callable, List, Dict, Any, Optional
+import functools
+
+import graph
+from graph_games import K_DominationGame, AsymmetricIDSGame, MaximalMatchingGame
+from game_solver import bestResponseSolver, worklistSolver, priorityWorklistSolver
+
+GAMES = {
+    "K_DominationGame": lambda g: K_DominationGame(2, g),
+    "AsymmetricIDSGame": lambda g: AsymmetricIDSGame(g),
+    "MaximalMatchingGame": lambda g: MaximalMatchingGame(g),
+}
+
+
+def timeRuns(fn: Callable[[], Any], repeat: int = 3) -> List[float]:
+    """return the wall times (in seconds) of `repeat` calls to fn"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def timeit(fn: Callable[[], Any], repeat: int = 3) -> float:
+    """return the best wall time (in seconds) of `repeat` calls to fn"""
+    return min(timeRuns(fn, repeat))
+
+
+def benchGenerators(sizes: List[int], k: int = 4, link_rewiring_prob: float = 0.8,
+                    quadratic_limit: int = 2000, repeat: int = 3) -> List[Dict[str, Any]]:
+    """
+    compare the original quadratic Watts-Strogatz generator with the rejection-sampling one
+    Input:
+        - sizes: the numbers of nodes to benchmark
+        - k, link_rewiring_prob: Watts-Strogatz parameters
+        - quadratic_limit: the quadratic generator is skipped for n above this limit
+        - repeat: number of repetitions, the best time is reported
+    Return:
+        a list of records {n, quadratic, rejection, batch} with times in seconds per graph
+        (None when skipped)
+    """
+    records = []
+    for n in sizes:
+        random.seed(n)
+        record = {"n": n, "quadratic": None}
+        if n <= quadratic_limit:
+            record["quadratic"] = timeit(
+                lambda: graph._randomWSGraphQuadratic(n, k, link_rewiring_prob), repeat)
+        record["rejection"] = timeit(
+            lambda: graph.randomWSGraph(n, k, link_rewiring_prob), repeat)
+        record["batch"] = timeit(
+            lambda: list(graph.randomWSGraphs(repeat, n, k, link_rewiring_prob, seed=n, compact=True)), 1) / repeat
+        records.append(record)
+    return records
+
+
+def _spread(times: List[float]) -> float:
+    """(slowest - fastest) / fastest run, the noise of a best-of-repeat time"""
+    best = min(times)
+    return (max(times) - best) / best if best else 0.0
+
+
+def _record(name: str, params: Dict[str, Any], seconds: float, ops: int = 1,
+            spread: float = 0.0) -> Dict[str, Any]:
+    return {"name": name, "params": params, "seconds": seconds, "ops": ops,
+            "seconds_per_op": seconds / ops, "spread": spread}
+
+
+def _timedRecord(name: str, params: Dict[str, Any], fn: Callable[[], Any], repeat: int = 3,
+                 ops: int = 1) -> Dict[str, Any]:
+    """record of the best of `repeat` calls to fn, with the spread of the calls"""
+    times = timeRuns(fn, repeat)
+    return _record(name, params, min(times), ops, _spread(times))
+
+
+def benchGame(name: str, n: int, k: int, p: float, sample: int = 10000,
+              repeat: int = 3, solver_limits: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+    """
+    micro benchmarks ( getUtil, getUtils, bestResponse, setAction ) and macro benchmarks
+    ( end-to-end solvers ) of one game class on one Watts-Strogatz graph
+    Input:
+        - name: a key of GAMES
+        - n, k, p: Watts-Strogatz parameters
+        - sample: number of players used by the micro benchmarks
+        - solver_limits: the largest n each solver is run on,
+            bestResponseSolver is O(n) per move and becomes impractical quickly
+    """
+    if solver_limits is None:
+        solver_limits = {"bestResponseSolver": 2000, "worklistSolver": 10**6, "priorityWorklistSolver": 10**6}
+    params = {"game": name, "n": n, "k": k, "p": p}
+    random.seed(n)
+    g = graph.randomWSGraph(n, k, p)
+    game = GAMES[name](g)
+    game.randomInit()
+    players = random.sample(list(game.getPlayers()), min(sample, n))
+    actions = [list(game.iterPossibleActions(q)) for q in players]
+    records = [
+        _timedRecord("getUtil", params,
+                     lambda: [game.getUtil(q) for q in players], repeat, len(players)),
+        _timedRecord("getUtils", params,
+                     lambda: [game.getUtils(q, a) for q, a in zip(players, actions)], repeat, len(players)),
+        _timedRecord("bestResponse", params,
+                     lambda: [game.bestResponse(q) for q in players], repeat, len(players)),
+    ]
+    new_actions = [random.choice(a) for a in actions]
+    old_actions = [game.getAction(q) for q in players]
+
+    def setActions():
+        for q, a in zip(players, new_actions):
+            game.setAction(q, a)
+        for q, a in zip(players, old_actions):
+            game.setAction(q, a)
+    records.append(_timedRecord("setAction", params, setActions, repeat, 2 * len(players)))
+
+    for solver in (bestResponseSolver, worklistSolver, priorityWorklistSolver):
+        if n > solver_limits.get(solver.__name__, n):
+            continue
+        snapshot = game.snapshot()
+
+        iterations = []
+
+        def solve():
+            # every repeat makes the same moves
+            random.seed(n)
+            game.restore(snapshot)
+            iterations.append(game.solve(solver))
+        times = timeRuns(solve, repeat)
+        # per iteration, the move sequence ( and its length ) depends on the string hash seed
+        # of the process, which differs between two benchmark runs
+        records.append(_record(solver.__name__, params, min(times), iterations[0], _spread(times)))
+    return records
+
+
+SCHEDULERS = {
+    "random": worklistSolver,
+    "fifo": functools.partial(worklistSolver, random_order=False),
+    "gain": functools.partial(priorityWorklistSolver, key="gain"),
+    "degree": functools.partial(priorityWorklistSolver, key="degree"),
+    "low_degree": functools.partial(priorityWorklistSolver, key="low_degree"),
+}
+
+
+def benchSchedulers(sizes: List[int], k: int = 4, p: float = 0.2, trials: int = 5,
+                    games: Optional[List[str]] = None, random_init: bool = True) -> List[Dict[str, Any]]:
+    """
+    compare the move orders of SCHEDULERS: every scheduler solves the same `trials`
+    random Watts-Strogatz games ( from the same initial profiles ) of every size
+    Return:
+        one entry per (game, n, scheduler) with the mean move count and mean wall time
+    """
+    rows = []
+    for name in games or list(GAMES):
+        for n in sizes:
+            totals = {s: [0, 0.0] for s in SCHEDULERS}
+            for trial in range(trials):
+                random.seed(trial)
+                game = GAMES[name](graph.randomWSGraph(n, k, p))
+                if random_init:
+                    game.randomInit()
+                snapshot = game.snapshot()
+                for scheduler, solver in SCHEDULERS.items():
+                    game.restore(snapshot)
+                    random.seed(trial)
+                    start = time.perf_counter()
+                    totals[scheduler][0] += game.solve(solver) - 1
+                    totals[scheduler][1] += time.perf_counter() - start
+            for scheduler, (moves, seconds) in totals.items():
+                rows.append({"game": name, "n": n, "scheduler": scheduler,
+                             "moves": moves / trials, "seconds": seconds / trials})
+            print(f'{name:20} n={n:<8} done', file=sys.stderr)
+    return rows
+
+
+def runSuite(sizes: List[int], ks: List[int], probs: List[float],
+             games: Optional[List[str]] = None, repeat: int = 3) -> Dict[str, Any]:
+    """run every benchmark over the parameter grid, return a JSON-serializable report"""
+    records = []
+    for n in sizes:
+        for k in ks:
+            for p in probs:
+                random.seed(n)
+                records.append(_timedRecord("randomWSGraph", {"n": n, "k": k, "p": p},
+                                            lambda: graph.randomWSGraph(n, k, p), 1 if n >= 10**5 else repeat))
+                for name in games or list(GAMES):
+                    records.extend(benchGame(name, n, k, p, repeat=repeat))
+                    print(f'{name:20} n={n:<8} k={k:<3} p={p:<5} done', file=sys.stderr)
+    return {"python": platform.python_version(), "machine": platform.machine(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"), "records": records}
+
+
+def _key(record: Dict[str, Any]) -> str:
+    return record["name"] + " " + json.dumps(record["params"], sort_keys=True)
+
+
+def compareReports(old: Dict[str, Any], new: Dict[str, Any], threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """
+    compare two reports of runSuite
+    Return:
+        one entry per benchmark present in both reports, with the ratio new/old of the
+        time per operation and whether it is a regression: ratio > 1 + threshold + the spreads
+        of the two measurements, so noisy benchmarks need a larger slowdown
+    """
+    old_records = {_key(r): r for r in old["records"]}
+    rows = []
+    for r in new["records"]:
+        o = old_records.get(_key(r))
+        if o is None:
+            continue
+        ratio = r["seconds_per_op"] / o["seconds_per_op"] if o["seconds_per_op"] else float("inf")
+        tolerance = threshold + o.get("spread", 0.0) + r.get("spread", 0.0)
+        rows.append({"benchmark": _key(r), "old": o["seconds_per_op"], "new": r["seconds_per_op"],
+                     "ratio": ratio, "regression": ratio > 1 + tolerance})
+    return rows
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="graph game benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("generators", help="compare the Watts-Strogatz generators")
+    run = sub.add_parser("run", help="run the benchmark suite")
+    run.add_argument("-o", "--output", default="benchmark.json")
+    run.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    run.add_argument("--k", type=int, nargs="+", default=[4])
+    run.add_argument("--p", type=float, nargs="+", default=[0.0, 0.4, 0.8])
+    run.add_argument("--games", nargs="+", choices=list(GAMES), default=None)
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--full", action="store_true", help="sizes from 100 to 10^6, k in 2 4 8")
+    schedulers = sub.add_parser("schedulers", help="compare the move orders of the worklist solvers")
+    schedulers.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    schedulers.add_argument("--k", type=int, default=4)
+    schedulers.add_argument("--p", type=float, default=0.2)
+    schedulers.add_argument("--trials", type=int, default=5)
+    schedulers.add_argument("--games", nargs="+", choices=list(GAMES), default=None)
+    compare = sub.add_parser("compare", help="flag regressions between two runs")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.add_argument("--threshold", type=float, default=0.1,
+                         help="relative slowdown reported as a regression, on top of the measured spreads")
+    args = parser.parse_args()
+
+    def fmt(t):
+        return f'{"skipped":>15}' if t is None else f'{t:15.4f}'
+
+    if args.command == "generators":
+        print("== Watts-Strogatz generation (k=4, rewiring_prob=0.8), seconds per graph")
+        print(f'{"n":>10}, {"quadratic":>15}, {"rejection":>15}, {"batch(compact)":>15}')
+        for r in benchGenerators([100, 1000, 2000, 10000, 50000]):
+            print(f'{r["n"]:10d}, {fmt(r["quadratic"])}, {fmt(r["rejection"])}, {fmt(r["batch"])}')
+    elif args.command == "schedulers":
+        print(f'{"game":20}, {"n":>8}, {"scheduler":>10}, {"moves":>12}, {"moves/node":>10}, {"seconds":>10}')
+        for r in benchSchedulers(args.sizes, args.k, args.p, args.trials, args.games):
+            print(f'{r["game"]:20}, {r["n"]:8d}, {r["scheduler"]:>10}, {r["moves"]:12.1f}, '
+                  f'{r["moves"] / r["n"]:10.3f}, {r["seconds"]:10.4f}')
+    elif args.command == "run":
+        if args.full:
+            args.sizes, args.k = [100, 1000, 10**4, 10**5, 10**6], [2, 4, 8]
+        report = runSuite(args.sizes, args.k, args.p, args.games, args.repeat)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"{len(report['records'])} benchmarks written to {args.output}")
+    else:
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        rows = compareReports(old, new, args.threshold)
+        print(f'{"benchmark":90}, {"old (s/op)":>12}, {"new (s/op)":>12}, {"ratio":>7}')
+        for row in rows:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(f'{row["benchmark"]:90}, {row["old"]:12.3e}, {row["new"]:12.3e}, {row["ratio"]:7.2f}{flag}')
+        sys.exit(1 if any(row["regression"] for row in rows) else 0)
@@ -0,0 +1,69 @@
+from typing import Iterator
+
+
+class BitSet:
+    """
+    Set of integers in range(size), packed one bit per element into a bytearray.
+    Supports the set operations used by the games ( in, add, remove, discard, clear, len, iter ),
+    plus whole-set conversion to a Python int for bulk bitwise checks.
+    """
+    __slots__ = ("bits", "size", "count")
+
+    def __init__(self, size: int) -> None:
+        self.bits = bytearray((size + 7) >> 3)
+        self.size = size
+        self.count = 0
+
+    def __contains__(self, i: int) -> bool:
+        return (self.bits[i >> 3] >> (i & 7)) & 1 == 1
+
+    def add(self, i: int) -> None:
+        mask = 1 << (i & 7)
+        if not self.bits[i >> 3] & mask:
+            self.bits[i >> 3] |= mask
+            self.count += 1
+
+    def discard(self, i: int) -> None:
+        mask = 1 << (i & 7)
+        if self.bits[i >> 3] & mask:
+            self.bits[i >> 3] ^= mask
+            self.count -= 1
+
+    def remove(self, i: int) -> None:
+        if i not in self:
+            raise KeyError(i)
+        self.discard(i)
+
+    def clear(self) -> None:
+        self.bits[:] = bytes(len(self.bits))
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[int]:
+        for byte_index, byte in enumerate(self.bits):
+            while byte:
+                low = byte & -byte
+                yield (byte_index << 3) + low.bit_length() - 1
+                byte ^= low
+
+    def toInt(self) -> int:
+        """return the set as an int whose bit i is set iff i is in the set"""
+        return int.from_bytes(self.bits, "little")
+
+    def copy(self) -> "BitSet":
+        other = BitSet.__new__(BitSet)
+        other.bits = bytearray(self.bits)
+        other.size = self.size
+        other.count = self.count
+        return other
+
+    def snapshot(self) -> bytes:
+        """return an immutable copy of the bits, O(size / 8) bytes"""
+        return bytes(self.bits)
+
+    def restore(self, snapshot: bytes) -> None:
+        """restore the bits from snapshot()"""
+        self.bits[:] = snapshot
+        self.count = bin(self.toInt()).count("1")
@@ -0,0 +1,356 @@
+"""
+Exhaustive search over the Nash Equilibria of small games, to measure the price of anarchy
+and the price of stability of the equilibria reached by the solvers
+
+Players are assigned one at a time ( searchOrder ), the unassigned players hold a neutral
+action. Once every player within interactionRadius of a player p is assigned, the utilities
+of p no longer depend on the rest of the search, so a partial profile in which p is not
+best-responding cannot be completed into an equilibrium and is pruned.
+The same search with a local feasibility check instead of the best-response check finds the
+social optimum ( socialObjective ).
+
+    - enumerateEquilibria: depth-first enumeration of every equilibrium
+    - extremeProfiles / equilibriumQuality: best and worst equilibria and the optimum, partial
+        profiles that agree on the players still read by pending checks are merged, so the
+        cost is exponential in the width of that frontier rather than in the number of players.
+        Sparse graphs ( e.g. Watts-Strogatz with k=2 ) of 40-60 players take seconds,
+        with k=4 the frontier limits the domination games to about 25 players
+
+For the domination games, build them with compact_state=True on a CompactGraph to search
+over the bitset state.
+"""
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import time
+
+import graph
+from graph_games import Game, K_DominationGame, AsymmetricIDSGame, MaximalMatchingGame
+
+Player = Any
+Action = Any
+
+
+def searchOrder(game: Game) -> List[Player]:
+    """
+    Cuthill-McKee order: breadth-first from a pseudo-peripheral player of each component,
+    neighbors are visited in increasing degree order. The order has a small bandwidth,
+    which keeps the frontier of extremeProfiles narrow and lets the checks of a player
+    happen soon after it is assigned
+    """
+    g = game.graph
+    degree = lambda p: (g.degree(p), p)
+    order: List[Player] = []
+    seen = set()
+    for start in sorted(game.getPlayers(), key=degree):
+        if start in seen:
+            continue
+        # walk to a player of ( locally ) maximal eccentricity
+        root, eccentricity = start, -1
+        while True:
+            distance = _distances(g, root)
+            farthest = max(distance.values())
+            if farthest <= eccentricity:
+                break
+            eccentricity = farthest
+            root = min((p for p, d in distance.items() if d == farthest), key=degree)
+        seen.add(root)
+        queue = deque([root])
+        while queue:
+            p = queue.popleft()
+            order.append(p)
+            for n in sorted(g.neighbors(p), key=degree):
+                if n not in seen:
+                    seen.add(n)
+                    queue.append(n)
+    return order
+
+
+def _distances(g: graph.Graph, root: Player) -> Dict[Player, int]:
+    """breadth-first distances from root to every node of its component"""
+    distance = {root: 0}
+    queue = deque([root])
+    while queue:
+        p = queue.popleft()
+        for n in g.neighbors(p):
+            if n not in distance:
+                distance[n] = distance[p] + 1
+                queue.append(n)
+    return distance
+
+
+def _checkSchedule(game: Game, order: List[Player], radius: int) -> List[List[Player]]:
+    """schedule[i]: the players whose neighborhood of the given radius is assigned once order[i] is"""
+    position = {p: i for i, p in enumerate(order)}
+    schedule: List[List[Player]] = [[] for _ in order]
+    for p in order:
+        last = max(position[q] for q in graph.neighborhood(game.graph, p, radius))
+        schedule[last].append(p)
+    return schedule
+
+
+def isBestResponding(game: Game, player: Player) -> bool:
+    """same stability test as game_solver.bestResponseMove"""
+    return game.getUtil(player) == game.bestResponse(player)[1]
+
+
+def socialObjective(game: Game) -> Tuple[str, Callable[[], int], bool, Action, Callable[[Player], bool]]:
+    """
+    the social objective of the game
+    Return:
+        (name, value, maximize, neutral, feasible)
+        - value(): the objective of the current profile, how much it changes when a player
+            changes its action depends only on the actions of the player and its neighbors
+        - maximize: whether larger values are better
+        - neutral: the action of unassigned players
+        - feasible(p): whether p satisfies the solution concept of the game, depends only on
+            the actions within distance 1 of p
+    """
+    if isinstance(game, AsymmetricIDSGame):
+        def feasible(p):
+            # dominated, and no dominator neighbor if p is a dominator
+            return (game.numDominator[p] == 0) if p in game.dominators else game.numDominator[p] >= 1
+        return "dominationSetCardinality", lambda: len(game.dominators), False, False, feasible
+    if isinstance(game, K_DominationGame):
+        def feasible(p):
+            return p in game.dominators or game.numDominator[p] >= game.k
+        return "dominationSetCardinality", lambda: len(game.dominators), False, False, feasible
+    if isinstance(game, MaximalMatchingGame):
+        def feasible(p):
+            # every proposal is reciprocated, so a player is matched iff it proposes,
+            # and an unmatched player has no unmatched neighbor
+            mate = game.strategy[p]
+            if mate is not None:
+                return game.strategy[mate] == p
+            return all(game.strategy[n] is not None for n in game.graph.neighbors(p))
+        return "numMatchingPairs", game.numMatchingPairs, True, None, feasible
+    raise TypeError(f"no social objective for {type(game).__name__}")
+
+
+def _equilibriumCheck(game: Game, order: List[Player]) -> Callable[[int], bool]:
+    """
+    check(depth): whether the players whose utilities are settled once order[depth] is
+    assigned are all best-responding
+    """
+    accept = lambda p: isBestResponding(game, p)
+    if type(game).utilityDependencies is Game.utilityDependencies:
+        return _scheduleCheck(game, order, game.interactionRadius, accept)
+    # the dependencies change with the actions, check a player once all of its current
+    # dependencies are assigned, only players within interactionRadius can depend on order[depth]
+    position = {p: i for i, p in enumerate(order)}
+    candidates = [graph.neighborhood(game.graph, p, game.interactionRadius) for p in order]
+
+    def check(depth: int) -> bool:
+        p = order[depth]
+        for q in candidates[depth]:
+            deps = game.utilityDependencies(q)
+            if p in deps and all(position[r] <= depth for r in deps) and not accept(q):
+                return False
+        return True
+    return check
+
+
+def _scheduleCheck(game: Game, order: List[Player], radius: int,
+                   accept: Callable[[Player], bool]) -> Callable[[int], bool]:
+    schedule = _checkSchedule(game, order, radius)
+    return lambda depth: all(accept(q) for q in schedule[depth])
+
+
+def _depthFirstSearch(game: Game, order: List[Player], check: Callable[[int], bool], neutral: Action) -> Iterator[None]:
+    """
+    depth-first search over the profiles, yields ( with the profile set in the game ) at every
+    complete profile that passed check(depth) at every depth
+    """
+    n = len(order)
+
+    def visit(depth: int) -> Iterator[None]:
+        if depth == n:
+            yield
+            return
+        p = order[depth]
+        for a in list(game.iterPossibleActions(p)):
+            game.setAction(p, a)
+            if check(depth):
+                yield from visit(depth + 1)
+        game.setAction(p, neutral)
+
+    return visit(0)
+
+
+def enumerateEquilibria(game: Game, order: Optional[List[Player]] = None) -> Iterator[Dict[Player, Action]]:
+    """
+    yield every Nash Equilibrium of the game as a profile,
+    the original profile of the game is restored when the iteration is finished
+    """
+    neutral = socialObjective(game)[3]
+    order = order or searchOrder(game)
+    check = _equilibriumCheck(game, order)
+    original = game.getProfile()
+    game.setProfile(dict.fromkeys(order, neutral))
+    try:
+        for _ in _depthFirstSearch(game, order, check, neutral):
+            yield game.getProfile()
+    finally:
+        game.setProfile(original)
+
+
+def extremeProfiles(game: Game, equilibrium: bool, order: Optional[List[Player]] = None,
+                    stats: Optional[Dict[str, int]] = None) -> Tuple[Tuple[Optional[int], Optional[Dict[Player, Action]]],
+                                                                  Tuple[Optional[int], Optional[Dict[Player, Action]]]]:
+    """
+    search for the profiles with the smallest and the largest social objective
+    Players are assigned in `order`, keeping for every partial profile only the actions of its
+    frontier: the assigned players that a pending check ( of a player whose neighborhood is not
+    assigned yet ) still reads. Partial profiles with the same frontier have the same
+    completions, so they are merged and only their smallest and largest objective values are
+    kept ( with a back pointer to rebuild the profile ). The cost grows exponentially with the
+    frontier width instead of the number of players.
+    Input:
+        - equilibrium: search over the Nash Equilibria, otherwise over the feasible profiles
+        - stats: if given, stats["nodes"] is increased by the number of partial profiles
+            expanded and stats["frontier"] is the largest number of merged partial profiles
+    Return:
+        ((smallest objective, profile), (largest objective, profile)),
+        the values and profiles are None if there is no such profile
+    """
+    _, value, _, neutral, feasible = socialObjective(game)
+    order = order or searchOrder(game)
+    radius = game.interactionRadius if equilibrium else 1
+    accept = (lambda p: isBestResponding(game, p)) if equilibrium else feasible
+    schedule = _checkSchedule(game, order, radius)
+    # release[x]: the depth of the last check that reads the action of x
+    release: Dict[Player, int] = {}
+    for depth, checked in enumerate(schedule):
+        for q in checked:
+            for x in graph.neighborhood(game.graph, q, radius):
+                release[x] = max(release.get(x, depth), depth)
+    if stats is None:
+        stats = {}
+    stats.setdefault("nodes", 0)
+    stats.setdefault("frontier", 0)
+
+    original = game.getProfile()
+    game.setProfile(dict.fromkeys(order, neutral))
+    frontier: List[Player] = []
+    # frontier actions -> [smallest value, largest value]
+    states: Dict[Tuple, List[int]] = {(): [0, 0]}
+    # back pointers of every depth, frontier actions -> [parent of the smallest, action, parent of the largest, action]
+    pointers: List[Dict[Tuple, List[Any]]] = []
+    try:
+        for depth, p in enumerate(order):
+            next_frontier = [x for x in frontier + [p] if release[x] > depth]
+            next_states: Dict[Tuple, List[int]] = {}
+            back: Dict[Tuple, List[Any]] = {}
+            for key, (low, high) in states.items():
+                for x, a in zip(frontier, key):
+                    game.setAction(x, a)
+                before = value()
+                for a in list(game.iterPossibleActions(p)):
+                    game.setAction(p, a)
+                    stats["nodes"] += 1
+                    if not all(accept(q) for q in schedule[depth]):
+                        continue
+                    delta = value() - before
+                    next_key = tuple(game.getAction(x) for x in next_frontier)
+                    bounds = next_states.get(next_key)
+                    if bounds is None:
+                        next_states[next_key] = [low + delta, high + delta]
+                        back[next_key] = [key, a, key, a]
+                        continue
+                    if low + delta < bounds[0]:
+                        bounds[0] = low + delta
+                        back[next_key][:2] = key, a
+                    if high + delta > bounds[1]:
+                        bounds[1] = high + delta
+                        back[next_key][2:] = key, a
+                game.setAction(p, neutral)
+            # the actions of released players are no longer read by any check
+            for x in frontier:
+                if release[x] <= depth:
+                    game.setAction(x, neutral)
+            frontier, states = next_frontier, next_states
+            pointers.append(back)
+            stats["frontier"] = max(stats["frontier"], len(states))
+            if not states:
+                return (None, None), (None, None)
+    finally:
+        game.setProfile(original)
+
+    def rebuild(side: int) -> Dict[Player, Action]:
+        profile = {}
+        key: Tuple = ()
+        for depth in range(len(order) - 1, -1, -1):
+            key, profile[order[depth]] = pointers[depth][key][2 * side: 2 * side + 2]
+        return profile
+    low, high = states[()]
+    return (low, rebuild(0)), (high, rebuild(1))
+
+
+def _ratio(a: Optional[int], b: Optional[int]) -> Optional[float]:
+    if a is None or b is None:
+        return None
+    if b == 0:
+        return 1.0 if a == 0 else float("inf")
+    return a / b
+
+
+def equilibriumQuality(game: Game, order: Optional[List[Player]] = None) -> Dict[str, Any]:
+    """
+    compute the best and worst Nash Equilibria and the social optimum of a small game
+    Return:
+        a dict with
+        - objective: the name of the social objective
+        - optimum, best_equilibrium, worst_equilibrium: objective values
+        - best_profile, worst_profile: the corresponding equilibria
+        - price_of_anarchy: worst equilibrium relative to the optimum,
+        - price_of_stability: best equilibrium relative to the optimum
+            (cost / optimum for minimized objectives, optimum / value for maximized ones,
+            both are >= 1 when every equilibrium is a feasible solution)
+        - nodes, frontier: search statistics ( see extremeProfiles ), seconds: search time
+    """
+    name, _, maximize, _, _ = socialObjective(game)
+    order = order or searchOrder(game)
+    stats = {"nodes": 0, "frontier": 0}
+    start = time.perf_counter()
+    (low, _), (high, _) = extremeProfiles(game, False, order, stats)
+    (low_eq, low_profile), (high_eq, high_profile) = extremeProfiles(game, True, order, stats)
+    if maximize:
+        optimum, best, best_profile, worst, worst_profile = high, high_eq, high_profile, low_eq, low_profile
+        poa, pos = _ratio(optimum, worst), _ratio(optimum, best)
+    else:
+        optimum, best, best_profile, worst, worst_profile = low, low_eq, low_profile, high_eq, high_profile
+        poa, pos = _ratio(worst, optimum), _ratio(best, optimum)
+    return {"objective": name, "optimum": optimum,
+            "best_equilibrium": best, "worst_equilibrium": worst,
+            "best_profile": best_profile, "worst_profile": worst_profile,
+            "price_of_anarchy": poa, "price_of_stability": pos,
+            "nodes": stats["nodes"], "frontier": stats["frontier"], "seconds": time.perf_counter() - start}
+
+
+if __name__ == '__main__':
+    import argparse
+    import random
+
+    parser = argparse.ArgumentParser(description="price of anarchy / stability on small Watts-Strogatz graphs")
+    parser.add_argument("--n", type=int, nargs="+", default=[20, 40, 60])
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--p", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    games = {
+        "K_DominationGame": lambda g: K_DominationGame(1, g, compact_state=True),
+        "AsymmetricIDSGame": lambda g: AsymmetricIDSGame(g, compact_state=True),
+        "MaximalMatchingGame": lambda g: MaximalMatchingGame(g),
+    }
+    def fmt(value, width, spec="d"):
+        return f'{"-":>{width}}' if value is None else f'{value:{width}{spec}}'
+
+    print(f'{"game":20}, {"n":>4}, {"opt":>4}, {"best":>4}, {"worst":>5}, {"PoA":>6}, {"PoS":>6}, {"nodes":>9}, {"time(s)":>8}')
+    for n in args.n:
+        random.seed(args.seed + n)
+        g = graph.randomWSGraph(n, args.k, args.p).compact()
+        for name, make in games.items():
+            q = equilibriumQuality(make(g))
+            print(f'{name:20}, {n:4d}, {fmt(q["optimum"], 4)}, {fmt(q["best_equilibrium"], 4)}, '
+                  f'{fmt(q["worst_equilibrium"], 5)}, {fmt(q["price_of_anarchy"], 6, ".3f")}, '
+                  f'{fmt(q["price_of_stability"], 6, ".3f")}, {q["nodes"]:9d}, {q["seconds"]:8.2f}')
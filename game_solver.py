@@ -1,8 +1,13 @@
 from graph_games import Game
+from collections import deque
+from concurrent.futures import Executor
+import heapq
+import multiprocessing
 import random
-import operator
 import itertools
-from typing import List, Any, Optional
+import time
+import graph
+from typing import List, Any, Callable, Optional, Tuple, Iterable, Union
 
 Player = Any
 
@@ -20,22 +25,24 @@ def bestResponseSingleStep(g: Game, population: List[Player]) -> Optional[Player
             - if the return value is a player, means we updated the player in last step
     """
     for p in population:
-        current_util = g.getUtil(p)
-        possible_acts = list(g.getPossibleActions(p))
-        possible_utils = g.getUtils(p, possible_acts)
-        # the first occorrance of the best responce
-        best_act_index, best_util = max(
-            enumerate(possible_utils), key=operator.itemgetter(1))
-
-        if current_util == best_util:
-            continue
-        else:
-            best_act = possible_acts[best_act_index]
-            g.setAction(p, best_act)
+        if bestResponseMove(g, p):
             return p
     return None
 
 
+def bestResponseMove(g: Game, p: Player) -> bool:
+    """
+    overwrite the action of player p with its best response if p is not best-responding yet
+    Return:
+        whether the action of p was changed
+    """
+    best_act, best_util = g.bestResponse(p)
+    if g.getUtil(p) == best_util:
+        return False
+    g.setAction(p, best_act)
+    return True
+
+
 def bestResponseSolver(g: Game) -> int:
     """
     Trace along best-response path toward a Nash-Equilibrium
@@ -46,13 +53,325 @@ def bestResponseSolver(g: Game) -> int:
         each iteration we overwrite the action of a player with his best response. 
     """
     population = list(g.getPlayers())
+    observer = g.observer
     for total_iters in itertools.count(start=1, step=1):
+        if observer is not None:
+            observer.onIteration()
         # get random order of the population
         random.shuffle(population)
         if bestResponseSingleStep(g, population) == None:
             return total_iters
 
 
+def worklistSolver(g: Game, random_order: bool = True, players: Optional[Iterable[Player]] = None) -> int:
+    """
+    Trace along best-response path toward a Nash-Equilibrium, 
+    re-examining only the players that may have become unstable after the last move
+    Input:
+        - g: an instance of Game in graph_game
+        - random_order: if True, the next player to check is drawn uniformly at random 
+            from the pending players, otherwise pending players are checked in FIFO order
+        - players: the players that might be unstable initially (default: every player),
+            all other players must already be best-responding
+    Return:
+        number of iterations during the solving, counted the same way as bestResponseSolver
+        (number of moves, plus the final iteration that confirms the equilibrium)
+    """
+    population = list(g.getPlayers() if players is None else set(players))
+    if random_order:
+        random.shuffle(population)
+    # players that might not be best-responding,
+    # a list allows O(1) removal of a random element, a deque O(1) FIFO pops
+    pending = population if random_order else deque(population)
+    is_pending = set(population)
+    move_count = 0
+    while pending:
+        if random_order:
+            # swap a random pending player to the end, then pop it
+            i = random.randrange(len(pending))
+            pending[i], pending[-1] = pending[-1], pending[i]
+            p = pending.pop()
+        else:
+            p = pending.popleft()
+        is_pending.remove(p)
+        if bestResponseMove(g, p):
+            move_count += 1
+            for q in g.getAffectedPlayers(p):
+                if q not in is_pending:
+                    is_pending.add(q)
+                    pending.append(q)
+    return move_count + 1
+
+
+def repairSolver(g: Game, affected: Iterable[Player], random_order: bool = True) -> int:
+    """
+    Warm-started re-equilibration after the game graph changed.
+    g must have been in a Nash Equilibrium before the changes, 
+    `affected` is the union of the sets returned by the graph mutation methods of g 
+    ( addNode, removeNode, addEdge, removeEdge ), only those players and the players 
+    affected by subsequent moves are examined, so local churn costs local work.
+    Return:
+        number of iterations of the repair, counted the same way as bestResponseSolver
+    """
+    return worklistSolver(g, random_order, players=affected)
+
+
+def priorityWorklistSolver(g: Game, key: Union[str, Callable[[Game, Player], float]] = "gain",
+                           players: Optional[Iterable[Player]] = None) -> int:
+    """
+    worklistSolver that always moves the pending player with the highest priority,
+    the pending players are kept in a binary heap, so picking the next one costs O(log n)
+    Input:
+        - g: an instance of Game in graph_game
+        - key: priority of a player, higher moves first
+            - "gain": utility gain of its best response over its current action,
+                re-evaluated for every affected player after each move, so only the players
+                that are not best-responding are in the heap
+            - "degree" / "low_degree": highest / lowest degree first, fixed priorities, a
+                pending player is checked when it is popped ( like worklistSolver )
+            - a function key(g, p), evaluated like "gain" for the players that are not
+                best-responding
+          ties are broken uniformly at random
+        - players: the players that might be unstable initially (default: every player),
+            all other players must already be best-responding
+    Return:
+        number of iterations during the solving, counted the same way as bestResponseSolver
+    """
+    population = list(g.getPlayers() if players is None else set(players))
+    heap: List[Tuple[float, float, Player]] = []
+    # player -> tiebreak of its valid heap entry, older entries of the player are stale
+    entry = {}
+    rand = random.random
+    if key in ("degree", "low_degree"):
+        sign = -1 if key == "degree" else 1
+        degree = g.graph.degree
+
+        def push(p: Player) -> None:
+            if p not in entry:
+                tiebreak = entry[p] = rand()
+                heapq.heappush(heap, (sign * degree(p), tiebreak, p))
+    else:
+        priority = None if key == "gain" else key
+
+        def push(p: Player) -> None:
+            best_util = g.bestResponse(p)[1]
+            util = g.getUtil(p)
+            if util == best_util:
+                entry.pop(p, None)
+                return
+            tiebreak = entry[p] = rand()
+            heapq.heappush(heap, (util - best_util if priority is None else -priority(g, p), tiebreak, p))
+
+    for p in population:
+        push(p)
+    move_count = 0
+    while heap:
+        _, tiebreak, p = heapq.heappop(heap)
+        if entry.get(p) != tiebreak:
+            continue
+        del entry[p]
+        if bestResponseMove(g, p):
+            move_count += 1
+            for q in g.getAffectedPlayers(p):
+                push(q)
+    return move_count + 1
+
+
+def _unstableMoves(g: Game, players: List[Player]) -> List[Tuple[Player, Any]]:
+    """return (player, best response) for the players that are not best-responding"""
+    moves = []
+    for p in players:
+        best_act, best_util = g.bestResponse(p)
+        if g.getUtil(p) != best_util:
+            moves.append((p, best_act))
+    return moves
+
+
+def _roundWorker(conn, g: Game) -> None:
+    # worker process of coloredRoundsSolver, keeps its own copy of the game in sync
+    # with the moves of the previous round
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        moves, players = message
+        for p, action in moves:
+            g.setAction(p, action)
+        conn.send(_unstableMoves(g, players))
+    conn.close()
+
+
+def coloredRoundsSolver(g: Game, executor: Optional[Executor] = None, chunk_size: int = 1024,
+                        random_order: bool = True, processes: int = 0) -> Tuple[int, int]:
+    """
+    Jacobi-style best-response rounds over a distance-2 colouring of the game graph.
+    Players of the same colour are more than g.interactionRadius (= 2) hops apart,
+    so all unstable players of one colour class can move at once without interfering.
+    Input:
+        - g: an instance of Game in graph_game
+        - executor: optional thread pool used to evaluate the best responses of a colour class
+            in chunks ( a process pool would pickle the whole game for every chunk, use processes )
+        - chunk_size: number of players per executor task
+        - random_order: visit the colour classes in a random order on every sweep
+        - processes: evaluate the colour classes in this many worker processes, every worker
+            gets the game once and then only the moves of the previous round with its share
+            of the next colour class
+    Return:
+        (iterations, rounds)
+            - iterations: counted the same way as bestResponseSolver
+            - rounds: number of colour-class rounds in which at least one player moved,
+                i.e. the parallel time of the solve
+    """
+    assert g.interactionRadius <= 2
+    classes = graph.distance2Coloring(g.graph)
+    pending = set(g.getPlayers())
+    move_count = 0
+    rounds = 0
+    workers = []
+    if processes:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        for _ in range(processes):
+            parent, child = context.Pipe()
+            worker = context.Process(target=_roundWorker, args=(child, g), daemon=True)
+            worker.start()
+            child.close()
+            workers.append((worker, parent))
+    # moves the workers have not seen yet
+    unsent: List[Tuple[Player, Any]] = []
+    try:
+        while pending:
+            if random_order:
+                random.shuffle(classes)
+            for color_class in classes:
+                players = [p for p in color_class if p in pending]
+                if not players:
+                    continue
+                pending.difference_update(players)
+                if workers:
+                    for i, (_, conn) in enumerate(workers):
+                        conn.send((unsent, players[i::len(workers)]))
+                    unsent = []
+                    moves = [m for _, conn in workers for m in conn.recv()]
+                elif executor is None:
+                    moves = _unstableMoves(g, players)
+                else:
+                    chunks = [players[i:i+chunk_size] for i in range(0, len(players), chunk_size)]
+                    moves = [m for ms in executor.map(_unstableMoves, itertools.repeat(g), chunks)
+                             for m in ms]
+                if not moves:
+                    continue
+                rounds += 1
+                move_count += len(moves)
+                unsent = moves
+                for p, action in moves:
+                    g.setAction(p, action)
+                    pending.update(g.getAffectedPlayers(p))
+    finally:
+        for worker, conn in workers:
+            conn.send(None)
+            conn.close()
+            worker.join()
+    return move_count + 1, rounds
+
+
+class SolveResult:
+    """
+    Outcome of a solver run with budgets and cycle detection
+        - status: CONVERGED, CYCLED or BUDGET_EXHAUSTED
+        - iterations: counted the same way as bestResponseSolver when converged
+            ( moves + 1 ), otherwise the number of moves made
+        - moves: number of best-response moves
+        - cycle_length: number of moves between the two visits of the repeated profile
+        - elapsed: wall time in seconds
+    """
+    CONVERGED = "converged"
+    CYCLED = "cycled"
+    BUDGET_EXHAUSTED = "budget_exhausted"
+
+    def __init__(self, status: str, moves: int, elapsed: float, cycle_length: Optional[int] = None) -> None:
+        self.status = status
+        self.moves = moves
+        self.iterations = moves + 1 if status == self.CONVERGED else moves
+        self.elapsed = elapsed
+        self.cycle_length = cycle_length
+
+    @property
+    def converged(self) -> bool:
+        return self.status == self.CONVERGED
+
+    def asDict(self) -> dict:
+        return {"status": self.status, "iterations": self.iterations, "moves": self.moves,
+                "cycle_length": self.cycle_length, "elapsed": self.elapsed}
+
+    def __repr__(self) -> str:
+        return f"SolveResult({self.asDict()})"
+
+
+_MASK64 = (1 << 64) - 1
+# salts come from their own generator, so a seeded run draws the same moves with and without hashing
+_saltRandom = random.Random()
+
+
+def zobristKey(player: Player, action: Any, salt: int) -> int:
+    """64-bit key of the pair (player, action), a splitmix64 finalizer over hash((player, action))"""
+    z = (hash((player, action)) ^ salt) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xbf58476d1ce4e5b9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94d049bb133111eb) & _MASK64
+    return z ^ (z >> 31)
+
+
+def profileHash(g: Game, salt: int) -> int:
+    """Zobrist hash of the current strategy profile, XOR of the keys of every (player, action)"""
+    h = 0
+    for p in g.getPlayers():
+        h ^= zobristKey(p, g.getAction(p), salt)
+    return h
+
+
+def boundedSolver(g: Game, max_iterations: Optional[int] = None, max_seconds: Optional[float] = None,
+                  detect_cycles: bool = True) -> SolveResult:
+    """
+    bestResponseSolver with budgets and best-response cycle detection.
+    The Zobrist hash of the strategy profile is updated in O(1) per move,
+    revisiting a profile means the best-response path cycles ( which can happen e.g. 
+    for MaximalMatchingGame with deg_penalty=False ).
+    Input:
+        - g: an instance of Game in graph_game
+        - max_iterations: stop after this many moves
+        - max_seconds: stop after this much wall time
+        - detect_cycles: remember the hash of every visited profile and stop on a revisit
+    Return:
+        a SolveResult
+    """
+    start = time.perf_counter()
+    salt = _saltRandom.getrandbits(64)
+    h = profileHash(g, salt)
+    # profile hash -> number of moves when it was visited
+    visited = {h: 0} if detect_cycles else None
+    population = list(g.getPlayers())
+    moves = 0
+    while True:
+        if max_iterations is not None and moves >= max_iterations or \
+                max_seconds is not None and time.perf_counter() - start >= max_seconds:
+            return SolveResult(SolveResult.BUDGET_EXHAUSTED, moves, time.perf_counter() - start)
+        # get random order of the population
+        random.shuffle(population)
+        for p in population:
+            old_action = g.getAction(p)
+            if bestResponseMove(g, p):
+                break
+        else:
+            return SolveResult(SolveResult.CONVERGED, moves, time.perf_counter() - start)
+        moves += 1
+        h ^= zobristKey(p, old_action, salt) ^ zobristKey(p, g.getAction(p), salt)
+        if detect_cycles:
+            if h in visited:
+                return SolveResult(SolveResult.CYCLED, moves, time.perf_counter() - start,
+                                   cycle_length=moves - visited[h])
+            visited[h] = moves
+
+
 if __name__ == '__main__':
     import graph
     from graph_games import K_DominationGame, AsymmetricIDSGame, MaximalMatchingGame
@@ -1,7 +1,14 @@
 from collections import defaultdict
-from typing import Set, Dict, Iterable, Tuple
-import copy
+from typing import Set, Dict, Iterable, Tuple, List, Any, Optional
+from array import array
+import itertools
+import math
 import random
+import sys
+try:
+    import numpy as np
+except ImportError:  # optional, CompactGraph.fromEdges then sorts in pure Python
+    np = None
 # undirected graph
 
 
@@ -30,7 +37,11 @@ class Graph:
             del self.edges[node]
 
     def addEdges(self, pairs: Iterable[Tuple[str, str]]) -> None:
-        map(lambda n1, n2: self.edge(n1, n2), pairs)
+        """add every edge (and both of its nodes) of an iterable of node pairs"""
+        for n1, n2 in pairs:
+            self.nodes.add(n1)
+            self.nodes.add(n2)
+            self.edge(n1, n2)
 
     def neighbors(self, node: str) -> None:
         return self.edges[node]
@@ -39,11 +50,387 @@ class Graph:
         return len(self.edges[node])
 
     def clone(self) -> "Graph":
-        return copy.deepcopy(self)
+        """copy of the node set and of every neighbor set, nodes are shared"""
+        g = Graph()
+        g.nodes = set(self.nodes)
+        g.edges.update((node, set(neighbors)) for node, neighbors in self.edges.items())
+        return g
 
+    def compact(self) -> "CompactGraph":
+        """return an immutable integer-indexed copy of the graph, see CompactGraph"""
+        return CompactGraph.fromGraph(self)
 
-def randomWSGraph(n=16, k=4, link_rewiring_prob=0.0):
-    """randomly initialize a graph using Watts-Strogatz Model"""
+
+class CompactGraph:
+    """
+    Immutable undirected graph with nodes relabeled to 0..n-1.
+    The adjacency is stored in CSR form, i.e. the neighbors of node i are
+        targets[offsets[i]:offsets[i+1]]
+    so every undirected edge takes two slots in `targets`.
+    Exposes the same query API as Graph ( nodes, neighbors, degree ),
+    `labels[i]` is the original label of node i.
+    """
+
+    def __init__(self, offsets: array, targets: array, labels: List[Any]) -> None:
+        assert len(offsets) == len(labels) + 1
+        assert offsets[-1] == len(targets)
+        self.offsets = offsets
+        self.targets = targets
+        self.labels = labels
+        self.nodes = range(len(labels))
+        self._index: Optional[Dict[Any, int]] = None
+        # slicing a memoryview does not copy the neighbor list
+        self._view = memoryview(targets)
+
+    @classmethod
+    def fromGraph(cls, g: Graph) -> "CompactGraph":
+        """convert a (mutable) Graph, nodes are numbered in sorted label order"""
+        labels = sorted(g.nodes)
+        index = {label: i for i, label in enumerate(labels)}
+        offsets = array('q', [0])
+        targets = array('i' if len(labels) < 2**31 else 'q')
+        for label in labels:
+            targets.extend(sorted(index[n] for n in g.neighbors(label)))
+            offsets.append(len(targets))
+        cg = cls(offsets, targets, labels)
+        cg._index = index
+        return cg
+
+    @classmethod
+    def fromEdges(cls, n: int, src: array, dst: array, labels: Optional[List[Any]] = None) -> "CompactGraph":
+        """
+        build the graph on nodes range(n) from the endpoints of its undirected edges ( edge i is
+        src[i] - dst[i] ), by a counting sort in O(n + m); duplicate edges are merged and
+        self-loops dropped. Nodes are labeled by their index unless labels are given.
+        With NumPy the sort is vectorised ( 10^6 edges in about 0.1 s ), otherwise it runs in
+        pure Python ( 10^6 edges in about 2.5 s )
+        """
+        if np is not None and n < 2**31:
+            return cls._fromEdgesNumpy(n, src, dst, labels)
+        degree = array('q', bytes(8 * n))
+        for u, v in zip(src, dst):
+            if u != v:
+                degree[u] += 1
+                degree[v] += 1
+        offsets = array('q', [0])
+        total = 0
+        for d in degree:
+            total += d
+            offsets.append(total)
+        typecode = 'i' if n < 2**31 else 'q'
+        targets = array(typecode, bytes(array(typecode).itemsize * total))
+        position = array('q', offsets)
+        for u, v in zip(src, dst):
+            if u != v:
+                targets[position[u]] = v
+                position[u] += 1
+                targets[position[v]] = u
+                position[v] += 1
+        # sort every neighbor list and drop duplicate edges in place
+        write = 0
+        start = 0
+        for i in range(n):
+            end = offsets[i + 1]
+            neighbors = sorted(set(targets[start:end]))
+            targets[write:write + len(neighbors)] = array(typecode, neighbors)
+            offsets[i] = write
+            write += len(neighbors)
+            start = end
+        offsets[n] = write
+        del targets[write:]
+        return cls(offsets, targets, range(n) if labels is None else labels)
+
+    @classmethod
+    def _fromEdgesNumpy(cls, n: int, src: array, dst: array, labels: Optional[List[Any]]) -> "CompactGraph":
+        src = np.asarray(src).astype(np.int64, copy=False)
+        dst = np.asarray(dst).astype(np.int64, copy=False)
+        loop = src == dst
+        if loop.any():
+            src, dst = src[~loop], dst[~loop]
+        # both directions of every edge as u * n + v, sorting them sorts every neighbor list
+        keys = np.concatenate((src * n + dst, dst * n + src))
+        keys.sort()
+        if len(keys):
+            keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // n, minlength=n), out=offsets[1:])
+        targets = array('i')
+        targets.frombytes((keys % n).astype(np.int32).tobytes())
+        return cls(array('q', offsets.tobytes()), targets, range(n) if labels is None else labels)
+
+    def toGraph(self) -> Graph:
+        """convert back to a mutable Graph with the original labels"""
+        g = Graph()
+        for i, label in enumerate(self.labels):
+            g.node(label)
+            for j in self.neighbors(i):
+                g.edges[label].add(self.labels[j])
+        return g
+
+    def index(self, label: Any) -> int:
+        """return the node index of an original label"""
+        if self._index is None:
+            self._index = {label: i for i, label in enumerate(self.labels)}
+        return self._index[label]
+
+    def neighbors(self, node: int) -> memoryview:
+        return self._view[self.offsets[node]:self.offsets[node+1]]
+
+    def degree(self, node: int) -> int:
+        return self.offsets[node+1] - self.offsets[node]
+
+    def numEdges(self) -> int:
+        return len(self.targets) // 2
+
+    def clone(self) -> "CompactGraph":
+        # immutable, safe to share
+        return self
+
+    def memoryUsage(self) -> Dict[str, float]:
+        """
+        report the memory used by the graph in bytes
+        Return:
+            a dict with the size of the adjacency arrays, the size of the label list
+            (labels and their index), and the adjacency cost per undirected edge
+        """
+        adjacency = (self.offsets.itemsize * len(self.offsets) +
+                     self.targets.itemsize * len(self.targets))
+        labels = sys.getsizeof(self.labels) + \
+            sum(sys.getsizeof(label) for label in self.labels)
+        if self._index is not None:
+            labels += sys.getsizeof(self._index)
+        return {
+            "nodes": len(self.labels),
+            "edges": self.numEdges(),
+            "adjacency_bytes": adjacency,
+            "label_bytes": labels,
+            "bytes_per_edge": adjacency / max(self.numEdges(), 1),
+        }
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_view"]
+        # graphs memory-mapped by graph_io.loadBinary are pickled as plain arrays
+        state.pop("_mmap", None)
+        for name in ("offsets", "targets"):
+            if isinstance(state[name], memoryview):
+                state[name] = array(state[name].format, state[name].tobytes())
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._view = memoryview(self.targets)
+
+
+def neighborhood(g: Graph, node: str, radius: int = 1) -> Set[str]:
+    """return the set of nodes within distance `radius` of `node` (including `node` itself)"""
+    ball = {node}
+    frontier = [node]
+    for _ in range(radius):
+        next_frontier = []
+        for u in frontier:
+            for v in g.neighbors(u):
+                if v not in ball:
+                    ball.add(v)
+                    next_frontier.append(v)
+        frontier = next_frontier
+    return ball
+
+
+def distance2Coloring(g: Graph) -> List[List[str]]:
+    """
+    greedy distance-2 colouring: nodes in the same colour class are more than 2 hops apart,
+    nodes are coloured in decreasing degree order
+    Return:
+        the list of colour classes
+    """
+    color: Dict[str, int] = {}
+    classes: List[List[str]] = []
+    for node in sorted(g.nodes, key=g.degree, reverse=True):
+        used = set(color[n] for n in neighborhood(g, node, 2) if n in color)
+        c = next(c for c in range(len(classes) + 1) if c not in used)
+        if c == len(classes):
+            classes.append([])
+        color[node] = c
+        classes[c].append(node)
+    return classes
+
+
+def randomWSGraph(n=16, k=4, link_rewiring_prob=0.0, rng=random):
+    """
+    randomly initialize a graph using Watts-Strogatz Model
+    each lattice edge (i, i+dk) is rewired with probability link_rewiring_prob
+    to a uniformly random node that is not already connected to i,
+    rewiring targets are found by rejection sampling, so the expected cost is O(n*k)
+    """
+    adjacency = _wsAdjacency(n, k, link_rewiring_prob, rng)
+    labels = [str(i) for i in range(n)]
+    ws = Graph()
+    ws.nodes.update(labels)
+    for i, neighbors in enumerate(adjacency):
+        ws.edges[labels[i]] = set(labels[j] for j in neighbors)
+    return ws
+
+
+def randomWSGraphs(num_graphs, n=16, k=4, link_rewiring_prob=0.0, seed=None, compact=False):
+    """
+    generate independent Watts-Strogatz graphs from a single seeded generator
+    Input:
+        - num_graphs: the number of graphs to generate
+        - n, k, link_rewiring_prob: same as randomWSGraph
+        - seed: seed of the shared random generator, the sequence of graphs is reproducible
+        - compact: if True, yield CompactGraph (built directly from the integer adjacency,
+            node i has label str(i)) instead of Graph
+    Return:
+        an iterator over the generated graphs
+    """
+    rng = random.Random(seed)
+    labels = [str(i) for i in range(n)]
+    for _ in range(num_graphs):
+        adjacency = _wsAdjacency(n, k, link_rewiring_prob, rng)
+        if compact:
+            offsets = array('q', [0])
+            targets = array('i')
+            for neighbors in adjacency:
+                targets.extend(sorted(neighbors))
+                offsets.append(len(targets))
+            yield CompactGraph(offsets, targets, labels)
+        else:
+            ws = Graph()
+            ws.nodes.update(labels)
+            for i, neighbors in enumerate(adjacency):
+                ws.edges[labels[i]] = set(labels[j] for j in neighbors)
+            yield ws
+
+
+def _wsAdjacency(n, k, link_rewiring_prob, rng) -> List[Set[int]]:
+    """Watts-Strogatz rewiring on integer nodes, return the adjacency set of each node"""
+    # k should be even
+    assert k % 2 == 0
+    adjacency: List[Set[int]] = [set() for _ in range(n)]
+    for i in range(n):
+        neighbors = adjacency[i]
+        for dk in range(1, k//2+1):
+            j = (i + dk) % n
+            if rng.random() < link_rewiring_prob:
+                if len(neighbors) >= n - 1:
+                    raise IndexError(f"node {i} is already connected to every node")
+                # change j to a random node that is not already connected to i
+                j = rng.randrange(n)
+                while j == i or j in neighbors:
+                    j = rng.randrange(n)
+            neighbors.add(j)
+            adjacency[j].add(i)
+    return adjacency
+
+
+def _rng(seed: Optional[int]) -> Any:
+    # the global random module unless a seed is given, so that random.seed() also reproduces graphs
+    return random if seed is None else random.Random(seed)
+
+
+def randomERGraph(n: int, p: float, seed: Optional[int] = None) -> CompactGraph:
+    """
+    Erdos-Renyi G(n, p) graph: every pair of nodes is connected independently with probability p.
+    The gaps between consecutive edges ( in lexicographic pair order ) are geometric, so only
+    the edges are drawn: O(n + m) ( Batagelj & Brandes, 2005 )
+    """
+    src, dst = array('i'), array('i')
+    if p > 0:
+        log_q = math.log(1 - p) if p < 1 else -math.inf
+        rng = _rng(seed)
+        v, w = 1, -1
+        while v < n:
+            w += 1 + int(math.log(1 - rng.random()) / log_q)
+            while w >= v and v < n:
+                w -= v
+                v += 1
+            if v < n:
+                src.append(v)
+                dst.append(w)
+    return CompactGraph.fromEdges(n, src, dst)
+
+
+def randomBAGraph(n: int, m: int, seed: Optional[int] = None) -> CompactGraph:
+    """
+    Barabasi-Albert preferential attachment graph: starting from m isolated nodes, every new node
+    is connected to m distinct existing nodes chosen with probability proportional to their degree.
+    Sampling from the list of edge endpoints ( every node repeated once per incident edge )
+    makes each attachment O(1), O(n * m) in total
+    """
+    assert 1 <= m < n, "m must be in [1, n)"
+    rng = _rng(seed)
+    src, dst = array('i'), array('i')
+    repeated = array('i')
+    targets = list(range(m))
+    for source in range(m, n):
+        for t in targets:
+            src.append(source)
+            dst.append(t)
+        repeated.extend(targets)
+        repeated.extend([source] * m)
+        chosen = set()
+        while len(chosen) < m:
+            chosen.add(repeated[int(rng.random() * len(repeated))])
+        targets = list(chosen)
+    return CompactGraph.fromEdges(n, src, dst)
+
+
+def randomGeometricGraph(n: int, radius: float, dim: int = 2, seed: Optional[int] = None) -> CompactGraph:
+    """
+    random geometric graph: n points uniformly in the unit cube of dimension dim, two nodes are
+    connected iff their euclidean distance is at most radius.
+    Points are bucketed in a grid of cells of side radius, so only pairs in adjacent cells are
+    compared: O(n + m) expected for radius ~ (c / n) ** (1 / dim), instead of all pairs
+    """
+    rng = _rng(seed)
+    points = [tuple(rng.random() for _ in range(dim)) for _ in range(n)]
+    cells: Dict[Tuple[int, ...], List[int]] = defaultdict(list)
+    for i, x in enumerate(points):
+        cells[tuple(int(c / radius) for c in x)].append(i)
+    # half of the neighboring cells ( lexicographically positive offsets ) plus the cell itself,
+    # so every pair of cells is visited once
+    offsets = [d for d in itertools.product((-1, 0, 1), repeat=dim) if d > (0,) * dim]
+    dist = math.dist
+    src, dst = array('i'), array('i')
+    for cell, members in cells.items():
+        for a, i in enumerate(members):
+            x = points[i]
+            for j in members[a + 1:]:
+                if dist(x, points[j]) <= radius:
+                    src.append(i)
+                    dst.append(j)
+        for d in offsets:
+            others = cells.get(tuple(c + e for c, e in zip(cell, d)))
+            if not others:
+                continue
+            for i in members:
+                x = points[i]
+                for j in others:
+                    if dist(x, points[j]) <= radius:
+                        src.append(i)
+                        dst.append(j)
+    return CompactGraph.fromEdges(n, src, dst)
+
+
+def randomConfigurationGraph(degrees: List[int], seed: Optional[int] = None) -> CompactGraph:
+    """
+    configuration model graph with the given degree sequence: the edge stubs are matched
+    uniformly at random in O(sum(degrees)). Self-loops and multi-edges are dropped
+    ( the "erased" configuration model ), so some nodes may end up with a smaller degree
+    """
+    if sum(degrees) % 2:
+        raise ValueError("the sum of the degrees must be even")
+    rng = _rng(seed)
+    stubs = array('i')
+    for node, degree in enumerate(degrees):
+        stubs.extend([node] * degree)
+    rng.shuffle(stubs)
+    return CompactGraph.fromEdges(len(degrees), stubs[0::2], stubs[1::2])
+
+
+def _randomWSGraphQuadratic(n=16, k=4, link_rewiring_prob=0.0):
+    """the original O(n^2*k*p) Watts-Strogatz generator, kept as a benchmark baseline"""
     # k should be even
     assert k % 2 == 0
     ws = Graph()
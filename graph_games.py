@@ -1,8 +1,10 @@
-from typing import Set, Dict, Any, Callable, Iterator, Optional, Union
-from collections import defaultdict
+from typing import Set, Dict, Any, Callable, Iterator, Optional, Union, Tuple
+from collections import defaultdict, Counter
+from array import array
 import itertools
 import random
 import graph
+from bitset import BitSet
 
 Action = Any
 Player = Any
@@ -17,6 +19,10 @@ class Game:
             3. modify player stategy  ( setAction, setProfile) 
 
     """
+    # a player's utility only depends on the actions of players within this distance
+    interactionRadius: int = 2
+    # optional metrics.SolverMetrics attached to the game, solvers report iterations to it
+    observer: Any = None
 
     def __init__(self) -> None:
         return
@@ -37,6 +43,10 @@ class Game:
         """ return all posible actions for a single player"""
         pass
 
+    def iterPossibleActions(self, p: Player) -> Iterator[Action]:
+        """ iterate over all possible actions for a single player without copying them"""
+        return iter(self.getPossibleActions(p))
+
     def getUtil(self, player: Player) -> float:
         """
          Return the utilities of a player in current strategy profile
@@ -54,6 +64,18 @@ class Game:
         """
         pass
 
+    def bestResponse(self, player: Player) -> Tuple[Action, float]:
+        """
+            Return the best response of a player and its utility, 
+            ties are broken by the first best action in iterPossibleActions order.
+            This default implementation evaluates every action with getUtils, 
+            subclasses compute it directly from the current state.
+        """
+        actions = list(self.iterPossibleActions(player))
+        utils = self.getUtils(player, actions)
+        best_index = max(range(len(actions)), key=utils.__getitem__)
+        return actions[best_index], utils[best_index]
+
     def setAction(self, player: Player, action: Action) -> None:
         """ set the current strategy of a player to certain action"""
         pass
@@ -62,6 +84,71 @@ class Game:
         """ set the current strategy profile to argument"""
         pass
 
+    def snapshot(self) -> Any:
+        """
+            return a copy of the strategy state, restore() brings the game back to it.
+            By default this is the strategy profile, subclasses also save their counters
+        """
+        return self.getProfile()
+
+    def restore(self, snapshot: Any) -> None:
+        """ restore the strategy state from snapshot(), the graph must not have changed in between"""
+        self.setProfile(snapshot)
+
+    def clone(self) -> "Game":
+        """
+            return an independent copy of the game that shares the graph, only the strategy
+            state is copied. The shared graph must not be mutated while both games are used
+        """
+        pass
+
+    def _shallowCopy(self) -> "Game":
+        """
+            copy of the instance attributes, without the instance attributes that shadow
+            class attributes ( methods wrapped by metrics.SolverMetrics, an attached observer )
+        """
+        game = object.__new__(type(self))
+        game.__dict__.update((name, value) for name, value in self.__dict__.items()
+                             if not hasattr(type(self), name))
+        return game
+
+    def getAffectedPlayers(self, player: Player) -> Set[Player]:
+        """
+            return the players whose utilities (for any of their actions) may change
+            when the action of `player` changes, including `player` itself.
+            By default this is every player within `interactionRadius` hops of `player`
+        """
+        return graph.neighborhood(self.graph, player, self.interactionRadius)
+
+    def utilityDependencies(self, player: Player) -> Set[Player]:
+        """
+            return the players whose actions the utilities of `player` (for any of its actions)
+            depend on in the current profile, including `player` itself.
+            By default this is every player within `interactionRadius` hops of `player`,
+            games can return a smaller set that depends on the current actions
+        """
+        return graph.neighborhood(self.graph, player, self.interactionRadius)
+
+    def addNode(self, player: Player) -> Set[Player]:
+        """
+            add an isolated player to the game graph ( with the default action ), 
+            the graph mutation methods keep the internal state of the game consistent and 
+            return the players whose utilities may have changed
+        """
+        pass
+
+    def removeNode(self, player: Player) -> Set[Player]:
+        """ remove a player and its edges from the game graph """
+        pass
+
+    def addEdge(self, player1: Player, player2: Player) -> Set[Player]:
+        """ add an edge between two existing players """
+        pass
+
+    def removeEdge(self, player1: Player, player2: Player) -> Set[Player]:
+        """ remove an existing edge """
+        pass
+
     def solve(self, solver: Callable[["Game"], int]) -> int:
         """solve the game using the given solver, return the iterations used"""
         return solver(self)
@@ -72,16 +159,19 @@ class K_DominationGame(Game):
     Simulate a K-Domination Game
     """
 
-    def __init__(self, k: int,  graph: graph.Graph, alpha=2, beta=1) -> None:
+    def __init__(self, k: int,  graph: graph.Graph, alpha=2, beta=1, compact_state=False) -> None:
         """
         make a K-domination Game from a given Graph
         Parameter:
             k: the minimum number of dominator-neighbors required
                  for each non-dominator node in a valid solution
-            graph: an instance of Graph from graph.py
+            graph: an instance of Graph (or CompactGraph) from graph.py
             alpha: utility gain for a player choosing "True" 
                 when a neibouring node is not yet k-dominated.
             beta: utility penalty (cost) for a player choosing "True" 
+            compact_state: store the state with integer player indices, requires a CompactGraph.
+                dominators is a BitSet, numDominator a fixed-width integer array, and
+                kDominated a BitSet of the players with at least k dominator neighbors
         Note: we should have alpha > beta > 0 in order to 
             get Nash Equilibriums that correspond to K-Dominating Sets 
         """
@@ -89,38 +179,71 @@ class K_DominationGame(Game):
         # whether record whether a player is in the domination set
         self.k = k
         self.graph = graph
-        self.dominators = set()
         self.players = self.graph.nodes
         self.alpha = alpha
         self.beta = beta
+        self.compact_state = compact_state
         # cache the number of nodes that dominate a particular node for faster computation
         # self.numDominator[p] should equal to
         #  len(set.intersection( graph.neibors, self.dominators ))
-        self.numDominator: Dict[Player, int] = defaultdict(lambda: 0)
+        self._clearState()
+        # running violation counters, maintained by setAction
+        #   underDominated: number of non-dominators with less than k dominator neighbors
+        #   dominatorPairs: number of edges between two dominators
+        self.underDominated = 0
+        self.dominatorPairs = 0
+        self.recount()
+
+    def _clearState(self) -> None:
+        """set every player to "False" """
+        if self.compact_state:
+            assert isinstance(self.graph, graph.CompactGraph), "compact_state requires a CompactGraph"
+            n = len(self.players)
+            maxDegree = max((self.graph.degree(p) for p in self.players), default=0)
+            typecode = 'B' if maxDegree < 2**8 else 'H' if maxDegree < 2**16 else 'I'
+            self.dominators = BitSet(n)
+            self.numDominator = array(typecode, bytes(n * array(typecode).itemsize))
+            self.kDominated = BitSet(n)
+        else:
+            self.dominators = set()
+            self.numDominator: Dict[Player, int] = defaultdict(int)
 
     def randomInit(self) -> None:
         """randomly initialize the strategies for each player"""
-        self.dominators.clear()
+        self._clearState()
         for p in self.players:
             if random.randint(0, 1) > 0:
                 self.dominators.add(p)
                 for n in self.graph.neighbors(p):
                     self.numDominator[n] += 1
+        self.recount()
+
+    def recount(self) -> None:
+        """recompute the violation counters from scratch"""
+        self.underDominated = sum(1 for p in self.players
+                                  if p not in self.dominators and self.numDominator[p] < self.k)
+        self.dominatorPairs = sum(self.numDominator[d] for d in self.dominators) // 2
+        if self.compact_state:
+            self.kDominated.clear()
+            for p in self.players:
+                if self.numDominator[p] >= self.k:
+                    self.kDominated.add(p)
 
     def getPlayers(self) -> Set[str]:
-        return self.players.copy()
+        return set(self.players)
 
     def getPossibleActions(self, player: str) -> Set[bool]:
         return set([True, False])
 
+    def iterPossibleActions(self, player: str) -> Iterator[bool]:
+        # same order as iterating getPossibleActions()
+        return iter((False, True))
+
     def getAction(self, player: str) -> bool:
         return player in self.dominators
 
     def getProfile(self) -> Dict[str, bool]:
-        profile = defaultdict(lambda: False)
-        for p in self.players:
-            profile[p] = True
-        return profile
+        return {p: p in self.dominators for p in self.players}
 
     def getUtil(self, player: str) -> float:
         if player not in self.dominators:
@@ -135,6 +258,21 @@ class K_DominationGame(Game):
                     return 0
             return sum(g(n) for n in self.graph.neighbors(player)) - self.beta
 
+    def bestResponse(self, player: str) -> Tuple[bool, float]:
+        # the utility of "False" is always 0, ties are broken towards "False"
+        util = self.dominatorUtil(player)
+        return (True, util) if util > 0 else (False, 0)
+
+    def dominatorUtil(self, player: str) -> float:
+        """ return the utility the player would get by choosing "True" """
+        if self.graph.degree(player) < self.k:
+            return self.alpha
+        # number of dominators of a neighbor once the player is a dominator
+        is_dominator = player in self.dominators
+        return sum(self.alpha for n in self.graph.neighbors(player)
+                   if n not in self.dominators
+                   and self.numDominator[n] + (not is_dominator) <= self.k) - self.beta
+
     def getUtils(self, player: str, actions: Iterator[bool]) -> Iterator[bool]:
         original_action = player in self.dominators
         utils = []
@@ -145,24 +283,166 @@ class K_DominationGame(Game):
         return utils
 
     def setAction(self, player: str, action: Action) -> None:
-        if player in self.dominators:
+        if self.compact_state:
+            self._setActionCompact(player, action)
+        elif player in self.dominators:
             if action == False:
                 self.dominators.remove(player)
+                if self.numDominator[player] < self.k:
+                    self.underDominated += 1
                 for n in self.graph.neighbors(player):
                     self.numDominator[n] -= 1
+                    if n in self.dominators:
+                        self.dominatorPairs -= 1
+                    elif self.numDominator[n] == self.k - 1:
+                        self.underDominated += 1
         else:
             if action == True:
                 self.dominators.add(player)
+                if self.numDominator[player] < self.k:
+                    self.underDominated -= 1
                 for n in self.graph.neighbors(player):
                     self.numDominator[n] += 1
+                    if n in self.dominators:
+                        self.dominatorPairs += 1
+                    elif self.numDominator[n] == self.k:
+                        self.underDominated -= 1
+
+    def _setActionCompact(self, player: int, action: Action) -> None:
+        # same as setAction, also keeps kDominated up to date
+        dominators = self.dominators
+        numDominator = self.numDominator
+        k = self.k
+        if (player in dominators) == bool(action):
+            return
+        if action:
+            dominators.add(player)
+            if numDominator[player] < k:
+                self.underDominated -= 1
+            for n in self.graph.neighbors(player):
+                numDominator[n] += 1
+                if n in dominators:
+                    self.dominatorPairs += 1
+                if numDominator[n] == k:
+                    self.kDominated.add(n)
+                    if n not in dominators:
+                        self.underDominated -= 1
+        else:
+            dominators.remove(player)
+            if numDominator[player] < k:
+                self.underDominated += 1
+            for n in self.graph.neighbors(player):
+                numDominator[n] -= 1
+                if n in dominators:
+                    self.dominatorPairs -= 1
+                if numDominator[n] == k - 1:
+                    self.kDominated.discard(n)
+                    if n not in dominators:
+                        self.underDominated += 1
 
     def setProfile(self, profile: Dict[Player, Action]) -> None:
         for p in self.players:
             self.setAction(p, profile[p])
 
+    def snapshot(self) -> Any:
+        """
+        return a copy of the strategy state, see restore()
+        in compact_state mode this is a few flat buffers ( O(n/64) words for the dominators )
+        """
+        if self.compact_state:
+            return (self.dominators.snapshot(), self.numDominator[:], self.kDominated.snapshot(),
+                    self.underDominated, self.dominatorPairs)
+        return (set(self.dominators), self.numDominator.copy(), None,
+                self.underDominated, self.dominatorPairs)
+
+    def restore(self, snapshot: Any) -> None:
+        """restore the strategy state from snapshot(), the graph must not have changed in between"""
+        dominators, numDominator, kDominated, self.underDominated, self.dominatorPairs = snapshot
+        if self.compact_state:
+            self.dominators.restore(dominators)
+            self.numDominator[:] = numDominator
+            self.kDominated.restore(kDominated)
+        else:
+            self.dominators = set(dominators)
+            self.numDominator = numDominator.copy()
+
+    def clone(self) -> "K_DominationGame":
+        # in compact_state mode the state is three flat buffers
+        game = self._shallowCopy()
+        if self.compact_state:
+            game.dominators = self.dominators.copy()
+            game.numDominator = self.numDominator[:]
+            game.kDominated = self.kDominated.copy()
+        else:
+            game.dominators = set(self.dominators)
+            game.numDominator = self.numDominator.copy()
+        return game
+
+    def checkDominationBulk(self) -> bool:
+        """
+        same as checkDomination, but evaluated as whole-bitset operations in compact_state mode:
+        every player is a dominator or has at least k dominator neighbors
+        """
+        if not self.compact_state:
+            return self.checkDomination()
+        everyone = (1 << len(self.players)) - 1
+        return self.dominators.toInt() | self.kDominated.toInt() == everyone
+
+    def _addDominatorCount(self, player: str, delta: int) -> None:
+        """change numDominator[player] by delta and keep underDominated consistent"""
+        if player not in self.dominators:
+            self.underDominated -= self.numDominator[player] < self.k
+        self.numDominator[player] += delta
+        if player not in self.dominators:
+            self.underDominated += self.numDominator[player] < self.k
+
+    def addNode(self, player: str) -> Set[str]:
+        assert player not in self.players
+        self.graph.node(player)
+        self.numDominator[player] = 0
+        self.underDominated += 0 < self.k
+        return {player}
+
+    def removeNode(self, player: str) -> Set[str]:
+        affected = set()
+        self.setAction(player, False)
+        for n in list(self.graph.neighbors(player)):
+            affected |= self.removeEdge(player, n)
+        self.underDominated -= self.numDominator[player] < self.k
+        del self.numDominator[player]
+        self.graph.nodeDel(player)
+        affected.discard(player)
+        return affected
+
+    def addEdge(self, player1: str, player2: str) -> Set[str]:
+        assert player1 != player2 and player2 not in self.graph.neighbors(player1)
+        self.graph.edge(player1, player2)
+        if player1 in self.dominators:
+            self._addDominatorCount(player2, 1)
+        if player2 in self.dominators:
+            self._addDominatorCount(player1, 1)
+        if player1 in self.dominators and player2 in self.dominators:
+            self.dominatorPairs += 1
+        return self._edgeAffectedPlayers(player1, player2)
+
+    def removeEdge(self, player1: str, player2: str) -> Set[str]:
+        affected = self._edgeAffectedPlayers(player1, player2)
+        self.graph.edgeDel(player1, player2)
+        if player1 in self.dominators:
+            self._addDominatorCount(player2, -1)
+        if player2 in self.dominators:
+            self._addDominatorCount(player1, -1)
+        if player1 in self.dominators and player2 in self.dominators:
+            self.dominatorPairs -= 1
+        return affected
+
+    def _edgeAffectedPlayers(self, player1: Player, player2: Player) -> Set[Player]:
+        """players whose utilities may depend on the edge (player1, player2), computed while it exists"""
+        return self.getAffectedPlayers(player1) | self.getAffectedPlayers(player2)
+
     def checkDomination(self) -> bool:
-        """check whether K-Domination condition is met"""
-        return all(self.numDominator[p] >= self.k for p in self.players-self.dominators)
+        """check whether K-Domination condition is met, O(1)"""
+        return self.underDominated == 0
 
     def dominationSetCardinality(self) -> int:
         assert self.checkDomination(
@@ -182,9 +462,9 @@ class AsymmetricIDSGame(K_DominationGame):
 
     """
 
-    def __init__(self,  graph: graph.Graph, alpha=2, beta=1) -> None:
+    def __init__(self,  graph: graph.Graph, alpha=2, beta=1, compact_state=False) -> None:
         # set k = 1
-        super().__init__(1, graph, alpha, beta)
+        super().__init__(1, graph, alpha, beta, compact_state)
         # make sure gamma larger than maximum degree times alpha
         maxDegree = max(self.graph.degree(p) for p in self.graph.nodes)
         self.gamma = maxDegree * alpha + 1
@@ -195,9 +475,20 @@ class AsymmetricIDSGame(K_DominationGame):
         """
         return super().checkDomination()
 
+    def addEdge(self, player1: str, player2: str) -> Set[str]:
+        affected = super().addEdge(player1, player2)
+        # keep gamma larger than maximum degree times alpha,
+        # gamma is never decreased, a larger gamma does not change any best response
+        maxDegree = max(self.graph.degree(player1), self.graph.degree(player2))
+        if maxDegree * self.alpha + 1 > self.gamma:
+            self.gamma = maxDegree * self.alpha + 1
+            # but it changes the utility of every dominator next to another dominator
+            return set(self.players)
+        return affected
+
     def checkIndependence(self) -> bool:
-        """check that the dominaotors are independent"""
-        return all(self.graph.neighbors(d).isdisjoint(self.dominators) for d in self.dominators)
+        """check that the dominaotors are independent, O(1)"""
+        return self.dominatorPairs == 0
 
     def getUtil(self, player: str) -> float:
         def g(i):
@@ -219,6 +510,22 @@ class AsymmetricIDSGame(K_DominationGame):
             ans = 0
         return ans
 
+    def dominatorUtil(self, player: str) -> float:
+        is_dominator = player in self.dominators
+
+        def g(i):
+            # number of dominators of a neighbor (including itself) once the player is a dominator
+            numDominatorIncludeSelf = self.numDominator[i] + (not is_dominator)
+            numDominatorIncludeSelf += 1 if i in self.dominators else 0
+            return self.alpha if numDominatorIncludeSelf == 1 else 0
+
+        ans = sum(g(i) for i in self.graph.neighbors(player))
+        ans += self.alpha if self.numDominator[player] == 0 else 0
+        ans -= self.beta
+        ans -= sum(self.gamma for n in self.graph.neighbors(player)
+                   if n in self.dominators and self.graph.degree(n) >= self.graph.degree(player))
+        return ans
+
 
 class MaximalMatchingGame(Game):
     """
@@ -234,7 +541,9 @@ class MaximalMatchingGame(Game):
 
         self.graph = graph
         self.players = graph.nodes
-        self.maxDeg = max(self.graph.degree(p) for p in self.players)
+        # number of players of each degree, to keep maxDeg up to date when the graph changes
+        self.degreeCount = Counter(self.graph.degree(p) for p in self.players)
+        self.maxDeg = max(self.degreeCount)
 
         self.alpha = 8
         self.beta = 6
@@ -242,8 +551,15 @@ class MaximalMatchingGame(Game):
         self.delta = 2
         # strategy Profile
         # all players' action are initialized to be None
-        self.strategy: Dict[Player, Optional[Player]
-                            ] = defaultdict(lambda: None)
+        self.strategy: Dict[Player, Optional[Player]] = dict.fromkeys(self.players)
+        # running counters, maintained by setAction
+        #   numMatched: number of matched players
+        #   numUnreciprocated: number of players proposing to a neighbor that does not propose back
+        #   numUnmatchedEdges: number of edges between two unmatched players
+        self.numMatched = 0
+        self.numUnreciprocated = 0
+        self.numUnmatchedEdges = 0
+        self.recount()
 
     def randomInit(self, act_prob=0.5) -> None:
         """it is suspected that no random initilization would run faster"""
@@ -251,58 +567,91 @@ class MaximalMatchingGame(Game):
             # choose a random neighbor with probability 0.5
             if random.random() < act_prob:
                 self.strategy[p] = random.choice(list(self.graph.neighbors(p)))
+        self.recount()
+
+    def recount(self) -> None:
+        """recompute the running counters from scratch"""
+        matched = unreciprocated = unmatched_edges = 0
+        for p in self.players:
+            if self.matched(p):
+                matched += 1
+                continue
+            if self.strategy[p] is not None:
+                unreciprocated += 1
+            for n in self.graph.neighbors(p):
+                if not self.matched(n):
+                    unmatched_edges += 1
+        self.numMatched, self.numUnreciprocated = matched, unreciprocated
+        # every edge is seen from both ends
+        self.numUnmatchedEdges = unmatched_edges // 2
+
+    def _unmatchedEdges(self, status: Dict[Player, bool]) -> int:
+        """
+        return the number of edges between two unmatched players incident to the players of status,
+        taking status[p] as whether p is matched ( the other players as they are ),
+        an edge between two of them is counted once
+        """
+        count = 0
+        seen = set()
+        for p, p_matched in status.items():
+            seen.add(p)
+            if p_matched:
+                continue
+            for n in self.graph.neighbors(p):
+                if n in status:
+                    if n not in seen and not status[n]:
+                        count += 1
+                elif not self.matched(n):
+                    count += 1
+        return count
 
     def numMatchingPairs(self) -> int:
         """return number of matching pairs"""
-        return sum(1 for p in self.players if self.matched(p)) // 2
+        return self.numMatched // 2
 
     def checkMatching(self) -> bool:
-        """check if current strategy forms a Valid Matching"""
-        for p in self.players:
-            if self.strategy[p]:
-                if self.strategy[self.strategy[p]] != p:
-                    return False
-        return True
+        """check if current strategy forms a Valid Matching, O(1)"""
+        return self.numUnreciprocated == 0
 
     def checkMaximal(self) -> bool:
-        """check if current strategy is Maximal"""
-        for p in filter(lambda x: not self.matched(x), self.players):
-            if any(not self.matched(n) for n in self.graph.neighbors(p)):
-                return False
-        return True
+        """check if current strategy is Maximal, O(1)"""
+        return self.numUnmatchedEdges == 0
 
     def checkMaximalMatching(self) -> bool:
         """check if current strategy is Maximal Matching"""
         return self.checkMatching() and self.checkMaximal()
 
     def matched(self, player: str) -> bool:
-        if not player:
+        if player is None:
             return False
         mate = self.strategy[player]
         return mate != None and self.strategy[mate] == player
 
     def robbable(self, robber: str, victum: str) -> bool:
-        if not robber or not victum:
+        if robber is None or victum is None:
             return False
         if victum not in self.graph.neighbors(robber):
             return False
         victum_mate = self.strategy[victum]
-        if not victum_mate or self.strategy[victum_mate] != victum:
+        if victum_mate is None or self.strategy[victum_mate] != victum:
             return False
         else:
             return self.graph.degree(victum_mate) > self.graph.degree(robber)
 
     def getPlayers(self) -> Set[str]:
-        return self.players.copy()
+        return set(self.players)
 
     def getAction(self, player: Player) -> Optional[str]:
         return self.strategy[player]
 
     def getPossibleActions(self, player: Player) -> Set[Union[None, str]]:
-        actions = self.graph.neighbors(player).copy()
+        actions = set(self.graph.neighbors(player))
         actions.add(None)
         return actions
 
+    def iterPossibleActions(self, player: Player) -> Iterator[Optional[str]]:
+        return itertools.chain(self.graph.neighbors(player), (None,))
+
     def getProfile(self) -> Dict[Player, Action]:
         return self.strategy.copy()
 
@@ -310,24 +659,31 @@ class MaximalMatchingGame(Game):
         util = 0
         if self.matched(player):
             util += self.alpha
-        elif self.strategy[player] and not self.matched(self.strategy[player]):
+        elif self.strategy[player] is not None and not self.matched(self.strategy[player]):
             util += self.beta
         elif self.strategy[player] == None:
             util += self.delta
 
-        def deg_penalty(n):
-            return (self.maxDeg - self.graph.degree(n)) / self.maxDeg
-
         if self.deg_penalty:
-            # match with proposed neigbour with lower degree
-            util -= sum(deg_penalty(n) for n in self.graph.neighbors(player)
-                        if self.strategy[n] == player and self.strategy[player] != n)
-            # proposed to the unmatched neighbor with lower degree
-            util -= sum(deg_penalty(n) for n in self.graph.neighbors(player)
-                        if not self.matched(n) and self.strategy[player] != n)
-            # rob the robbable neighbor with lower degree
-            util -= sum(deg_penalty(n) for n in self.graph.neighbors(player)
-                        if self.robbable(player, n) and self.strategy[player] != n)
+            # every missed opportunity with a neighbour n costs (maxDeg - deg(n)) / maxDeg, i.e.
+            #   - match with proposed neigbour with lower degree
+            #   - proposed to the unmatched neighbor with lower degree
+            #   - rob the robbable neighbor with lower degree
+            # the neighbour list is walked once and the penalties summed as integers, the way
+            # bestResponse sums them, so both give bit-identical utilities
+            action = self.strategy[player]
+            player_deg = self.graph.degree(player)
+            penalty = 0
+            for n in self.graph.neighbors(player):
+                if n == action:
+                    continue
+                mate = self.strategy[n]
+                n_matched = mate is not None and self.strategy[mate] == n
+                missed = (mate == player) + (not n_matched) + \
+                    (n_matched and self.graph.degree(mate) > player_deg)
+                if missed:
+                    penalty += missed * (self.maxDeg - self.graph.degree(n))
+            util -= penalty / self.maxDeg
 
         if self.robbing_reward and self.deg_penalty:
             """ robbing only work with deg_penalty == True, otherwise, NE may not be a Valid Matching because matched neighbors won't be robbed"""
@@ -335,6 +691,78 @@ class MaximalMatchingGame(Game):
                 util += self.gamma
         return util
 
+    def utilityDependencies(self, player: Player) -> Set[Player]:
+        # the neighbours, and the players they propose to ( who decide whether they are matched )
+        deps = {player}
+        for n in self.graph.neighbors(player):
+            deps.add(n)
+            if self.strategy[n] is not None:
+                deps.add(self.strategy[n])
+        return deps
+
+    def missedCost(self, player: Player, n: Player) -> int:
+        """
+        return maxDeg times the degree penalty the player pays for neighbour n,
+        assuming the player does not propose to n
+        """
+        mate = self.strategy[n]
+        if mate == player:
+            # n proposed to the player and is unmatched
+            missed = 2
+        else:
+            n_matched = mate is not None and self.strategy[mate] == n
+            missed = (not n_matched) + \
+                (n_matched and self.graph.degree(mate) > self.graph.degree(player))
+        return missed * (self.maxDeg - self.graph.degree(n)) if missed else 0
+
+    def bestResponse(self, player: Player) -> Tuple[Optional[str], float]:
+        # the penalty of neighbour n only depends on whether the player proposes to n, so
+        # maxDeg * utility(a) = maxDeg * (base(a) + robbing reward) - (total_penalty - missedCost(a)),
+        # the actions are compared on this exact value and ties are broken in getPossibleActions
+        # order, the order the original solver scanned the actions in
+        total = 0
+        if self.deg_penalty:
+            for n in self.graph.neighbors(player):
+                total += self.missedCost(player, n)
+        scale = self.maxDeg if self.deg_penalty else 1
+        rob = self.robbing_reward and self.deg_penalty
+        player_deg = self.graph.degree(player)
+        best_score = None
+        # (action, base utility, penalty, robbing reward) of the best actions
+        best = []
+        for a in self.graph.neighbors(player):
+            mate = self.strategy[a]
+            if mate == player:
+                util = self.alpha
+            elif mate is None or self.strategy[mate] != a:
+                util = self.beta
+            else:
+                util = 0
+            penalty = total - self.missedCost(player, a) if self.deg_penalty else 0
+            reward = self.gamma if rob and mate is not None and mate != player and self.strategy[mate] == a \
+                and self.graph.degree(mate) > player_deg else 0
+            score = (util + reward) * scale - penalty
+            if best_score is None or score > best_score:
+                best_score, best = score, [(a, util, penalty, reward)]
+            elif score == best_score:
+                best.append((a, util, penalty, reward))
+        score = self.delta * scale - total
+        if best_score is None or score > best_score:
+            best = [(None, self.delta, total, 0)]
+        elif score == best_score:
+            best.append((None, self.delta, total, 0))
+        if len(best) > 1:
+            tied = {entry[0]: entry for entry in best}
+            best_act, util, penalty, reward = next(tied[a] for a in self.getPossibleActions(player) if a in tied)
+        else:
+            best_act, util, penalty, reward = best[0]
+        # the same float operations as getUtil
+        if self.deg_penalty:
+            util -= penalty / self.maxDeg
+        if reward:
+            util += reward
+        return best_act, util
+
     def getUtils(self, player: str, actions: Iterator[Optional[str]]) -> Iterator[float]:
         original_action = self.getAction(player)
         utils = []
@@ -345,9 +773,244 @@ class MaximalMatchingGame(Game):
         return utils
 
     def setAction(self, player: str, action: Optional[str]) -> None:
-        assert action in self.getPossibleActions(player)
-        self.strategy[player] = action
+        assert action is None or action in self.graph.neighbors(player)
+        old = self.strategy[player]
+        if old == action:
+            return
+        # only the status of player, its old and its new target can change, O(1)
+        strategy = self.strategy
+        touched = [x for x in (player, old, action) if x is not None]
+        before = [self.matched(x) for x in touched]
+        for x, m in zip(touched, before):
+            if not m and strategy[x] is not None:
+                self.numUnreciprocated -= 1
+        strategy[player] = action
+        flipped = {}
+        for x, m in zip(touched, before):
+            now = self.matched(x)
+            if not now and strategy[x] is not None:
+                self.numUnreciprocated += 1
+            if now != m:
+                flipped[x] = m
+        if flipped:
+            # the matching changed: the edges of the players that got ( un )matched, O(deg)
+            after = {x: not m for x, m in flipped.items()}
+            self.numMatched += sum(after.values()) - sum(flipped.values())
+            self.numUnmatchedEdges += self._unmatchedEdges(after) - self._unmatchedEdges(flipped)
 
     def setProfile(self, profile: Dict[str, Optional[str]]) -> None:
         for p in profile.keys():
             self.setAction(p, profile[p])
+
+    def snapshot(self) -> Any:
+        return (self.strategy.copy(), self.numMatched, self.numUnreciprocated, self.numUnmatchedEdges)
+
+    def restore(self, snapshot: Any) -> None:
+        strategy, self.numMatched, self.numUnreciprocated, self.numUnmatchedEdges = snapshot
+        self.strategy = strategy.copy()
+
+    def clone(self) -> "MaximalMatchingGame":
+        game = self._shallowCopy()
+        game.strategy = self.strategy.copy()
+        game.degreeCount = self.degreeCount.copy()
+        return game
+
+    def _changeDegree(self, old_deg: int, new_deg: int) -> bool:
+        """update degreeCount and maxDeg, return whether maxDeg changed"""
+        self.degreeCount[old_deg] -= 1
+        if self.degreeCount[old_deg] == 0:
+            del self.degreeCount[old_deg]
+        self.degreeCount[new_deg] += 1
+        old_max = self.maxDeg
+        self.maxDeg = max(self.maxDeg, new_deg) if new_deg > old_deg else max(self.degreeCount)
+        return self.maxDeg != old_max
+
+    def addNode(self, player: str) -> Set[str]:
+        assert player not in self.players
+        self.graph.node(player)
+        self.strategy[player] = None
+        self.degreeCount[0] += 1
+        return {player}
+
+    def removeNode(self, player: str) -> Set[str]:
+        affected = set()
+        self.setAction(player, None)
+        for n in list(self.graph.neighbors(player)):
+            affected |= self.removeEdge(player, n)
+        self.degreeCount[0] -= 1
+        if self.degreeCount[0] == 0:
+            del self.degreeCount[0]
+        del self.strategy[player]
+        self.graph.nodeDel(player)
+        affected.discard(player)
+        return affected
+
+    def addEdge(self, player1: str, player2: str) -> Set[str]:
+        assert player1 != player2 and player2 not in self.graph.neighbors(player1)
+        self.graph.edge(player1, player2)
+        rescaled = False
+        for p in (player1, player2):
+            deg = self.graph.degree(p)
+            rescaled |= self._changeDegree(deg - 1, deg)
+        if not self.matched(player1) and not self.matched(player2):
+            self.numUnmatchedEdges += 1
+        if rescaled:
+            # the degree penalty of every player depends on maxDeg
+            return set(self.players)
+        return self.getAffectedPlayers(player1) | self.getAffectedPlayers(player2)
+
+    def removeEdge(self, player1: str, player2: str) -> Set[str]:
+        affected = self.getAffectedPlayers(player1) | self.getAffectedPlayers(player2)
+        # a player can only propose to a neighbor
+        for p, q in ((player1, player2), (player2, player1)):
+            if self.strategy[p] == q:
+                self.setAction(p, None)
+        if not self.matched(player1) and not self.matched(player2):
+            self.numUnmatchedEdges -= 1
+        self.graph.edgeDel(player1, player2)
+        rescaled = False
+        for p in (player1, player2):
+            deg = self.graph.degree(p)
+            rescaled |= self._changeDegree(deg + 1, deg)
+        if rescaled:
+            return set(self.players)
+        return affected
+
+
+class CachedGame(Game):
+    """
+    Wrap a Game and cache, for every player, its current utility and its best response.
+
+    Cached entries are invalidated only for the players returned by
+    game.getAffectedPlayers(p) when setAction(p, ...) actually changes the action of p,
+    so asking whether a player is stable costs O(1) amortized.
+    The wrapped game must only be modified through the wrapper while the cache is in use.
+    Other attributes (checkDomination, numMatchingPairs, ...) are forwarded to the wrapped game.
+    """
+
+    def __init__(self, game: Game) -> None:
+        self.game = game
+        self.graph = game.graph
+        # player -> current utility
+        self.utilCache: Dict[Player, float] = {}
+        # player -> (best action, utility of the best action)
+        self.bestCache: Dict[Player, Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # only called for attributes that are not found on the wrapper
+        if name == "game":
+            raise AttributeError(name)
+        return getattr(self.game, name)
+
+    def getPlayers(self) -> Set[Player]:
+        return self.game.getPlayers()
+
+    def getAction(self, player: Player) -> Action:
+        return self.game.getAction(player)
+
+    def getProfile(self) -> Dict[Player, Action]:
+        return self.game.getProfile()
+
+    def getPossibleActions(self, player: Player) -> Set[Action]:
+        return self.game.getPossibleActions(player)
+
+    def getAffectedPlayers(self, player: Player) -> Set[Player]:
+        return self.game.getAffectedPlayers(player)
+
+    def getUtil(self, player: Player) -> float:
+        util = self.utilCache.get(player)
+        if util is None:
+            self.misses += 1
+            util = self.utilCache[player] = self.game.getUtil(player)
+        else:
+            self.hits += 1
+        return util
+
+    def getUtils(self, player: Player, actions: Iterator[Action]) -> Iterator[float]:
+        return self.game.getUtils(player, actions)
+
+    def iterPossibleActions(self, player: Player) -> Iterator[Action]:
+        return self.game.iterPossibleActions(player)
+
+    def bestResponse(self, player: Player) -> Tuple[Action, float]:
+        best = self.bestCache.get(player)
+        if best is None:
+            self.misses += 1
+            best = self.bestCache[player] = self.game.bestResponse(player)
+        else:
+            self.hits += 1
+        return best
+
+    def isStable(self, player: Player) -> bool:
+        """whether the player is already playing a best response"""
+        return self.getUtil(player) == self.bestResponse(player)[1]
+
+    def setAction(self, player: Player, action: Action) -> None:
+        if self.game.getAction(player) == action:
+            return
+        self.game.setAction(player, action)
+        self._invalidate(self.game.getAffectedPlayers(player))
+
+    def setProfile(self, profile: Dict[Player, Action]) -> None:
+        self.game.setProfile(profile)
+        self.clearCache()
+
+    def randomInit(self, *args, **kwargs) -> None:
+        self.game.randomInit(*args, **kwargs)
+        self.clearCache()
+
+    def snapshot(self) -> Any:
+        return self.game.snapshot()
+
+    def restore(self, snapshot: Any) -> None:
+        self.game.restore(snapshot)
+        self.clearCache()
+
+    def clone(self) -> "CachedGame":
+        # the cached entries are still valid for the copy
+        game = CachedGame(self.game.clone())
+        game.utilCache.update(self.utilCache)
+        game.bestCache.update(self.bestCache)
+        return game
+
+    def _invalidate(self, players: Set[Player]) -> Set[Player]:
+        for q in players:
+            self.utilCache.pop(q, None)
+            self.bestCache.pop(q, None)
+        return players
+
+    def addNode(self, player: Player) -> Set[Player]:
+        return self._invalidate(self.game.addNode(player))
+
+    def removeNode(self, player: Player) -> Set[Player]:
+        self._invalidate({player})
+        return self._invalidate(self.game.removeNode(player))
+
+    def addEdge(self, player1: Player, player2: Player) -> Set[Player]:
+        return self._invalidate(self.game.addEdge(player1, player2))
+
+    def removeEdge(self, player1: Player, player2: Player) -> Set[Player]:
+        return self._invalidate(self.game.removeEdge(player1, player2))
+
+    def clearCache(self) -> None:
+        self.utilCache.clear()
+        self.bestCache.clear()
+
+    def cacheStats(self) -> Dict[str, float]:
+        """return hit / miss counters of the cache"""
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def checkCache(self) -> bool:
+        """check every cached entry against the wrapped (uncached) game"""
+        for p, util in self.utilCache.items():
+            if util != self.game.getUtil(p):
+                return False
+        for p, (action, util) in self.bestCache.items():
+            utils = self.game.getUtils(p, list(self.game.getPossibleActions(p)))
+            if util != max(utils) or util != self.game.getUtils(p, [action])[0]:
+                return False
+        return True
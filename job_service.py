@@ -0,0 +1,479 @@
+"""
+Local asyncio service that solves game jobs on a bounded process pool
+
+A job is a JSON-compatible dict, every name is resolved in the modules of this repo:
+    {
+        "id": "job-1",                          # optional, echoed back in every event
+        "game": "K_DominationGame",             # a Game class from graph_games
+        "game_kwargs": {"k": 2},
+        "graph": "randomWSGraph",               # a generator from graph.py ( random* ), or
+                                                # loadEdgeList / loadBinary from graph_io with
+                                                # graph_kwargs {"path": ...} relative to the
+                                                # service's data_dir ( disabled without one )
+        "graph_kwargs": {"n": 30, "k": 4, "link_rewiring_prob": 0.2},
+        "seed": 0,                              # seeds the generator and the solver ( random.seed )
+        "random_init": False,
+        "solver": "worklistSolver",             # optional, one of SOLVERS from game_solver
+        "solver_kwargs": {},
+    }
+and is solved by sweep.runTrial, its result is the trial record ( move_count, cardinality, ... ).
+As in sweep.py, set PYTHONHASHSEED to get the same record for the same job across runs.
+
+    async with JobService(processes=4) as service:
+        record = await service.solve(job)                   # or
+        future = await service.submit(job, progress)        # waits while the queue is full
+        server = await service.serve(port=8765)             # newline-delimited JSON over TCP
+
+Scheduling:
+    - submit() puts the job into a bounded queue and blocks while the queue is full, over TCP
+        the connection stops being read, so backpressure reaches the client
+    - the dispatcher groups consecutive small jobs into one worker call ( at most batch_size jobs
+        and batch_nodes nodes, a job's size is graph_kwargs["n"] ), large jobs are sent alone
+    - at most 2 * processes batches are in flight, the queue fills up behind them
+Progress events are emitted per job: "queued", "running" ( its batch was sent to a worker ),
+then "result" or "error".
+
+Protocol: the client sends one JSON object per line,
+    {"op": "submit", "job": {...}} or {"op": "stats"}
+and receives one JSON object per line,
+    {"event": "queued" | "running" | "result" | "error" | "stats", "id": ..., ...}
+The server only listens on localhost by default.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import functools
+import itertools
+import json
+import multiprocessing
+import os
+import time
+
+import graph
+import graph_games
+import graph_io
+import game_solver
+import sweep
+
+Job = Dict[str, Any]
+Record = Dict[str, Any]
+# progress(event, job id, payload)
+Progress = Callable[[str, Any, Dict[str, Any]], None]
+
+
+class JobError(Exception):
+    """a job failed in the worker, the message is the worker's exception"""
+
+
+# graph sources reading a file, only from the data directory of the service
+FILE_SOURCES = ("loadEdgeList", "loadBinary")
+
+
+def _graphSource(name: str) -> Callable:
+    if name in FILE_SOURCES:
+        return getattr(graph_io, name)
+    if name.startswith("random") and callable(getattr(graph, name, None)):
+        return getattr(graph, name)
+    raise ValueError(f"unknown graph source {name!r}")
+
+
+def _gameClass(name: str) -> type:
+    cls = getattr(graph_games, name, None)
+    if not (isinstance(cls, type) and issubclass(cls, graph_games.Game)) or cls is graph_games.Game:
+        raise ValueError(f"unknown game {name!r}")
+    return cls
+
+
+# solvers that only need the game and return an iteration count or a SolveResult
+SOLVERS = ("bestResponseSolver", "worklistSolver", "priorityWorklistSolver", "boundedSolver")
+
+
+def _solver(name: str) -> Callable:
+    if name not in SOLVERS:
+        raise ValueError(f"unknown solver {name!r}, expected one of {', '.join(SOLVERS)}")
+    return getattr(game_solver, name)
+
+
+def _dataPath(path: Any, data_dir: Optional[str]) -> str:
+    """resolve the path of a graph file against data_dir, raise ValueError if it lies outside"""
+    if data_dir is None:
+        raise ValueError("graph files are disabled, the service has no data directory")
+    if not isinstance(path, str):
+        raise ValueError("a graph file needs a path")
+    root = os.path.realpath(data_dir)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root:
+        raise ValueError(f"graph file {path!r} is outside the data directory")
+    return full
+
+
+def makeCell(job: Job, data_dir: Optional[str] = None) -> sweep.Cell:
+    """
+    resolve the names of a job into a sweep cell, raise ValueError for unknown names
+    and for graph files outside data_dir
+    """
+    graph_name = job.get("graph", "randomWSGraph")
+    graph_kwargs = job.get("graph_kwargs", {})
+    if graph_name in FILE_SOURCES:
+        graph_kwargs = dict(graph_kwargs, path=_dataPath(graph_kwargs.get("path"), data_dir))
+    cell = {
+        "game": _gameClass(job["game"]),
+        "game_kwargs": job.get("game_kwargs", {}),
+        "graph": _graphSource(graph_name),
+        "graph_kwargs": graph_kwargs,
+        "random_init": job.get("random_init", False),
+    }
+    solver = _solver(job.get("solver", "bestResponseSolver"))
+    if job.get("solver_kwargs"):
+        solver = functools.partial(solver, **job["solver_kwargs"])
+    cell["solver"] = solver
+    return cell
+
+
+def jobSize(job: Job) -> int:
+    """estimated size of a job ( its number of nodes ), used for batching"""
+    return int(job.get("graph_kwargs", {}).get("n", 1 << 30))
+
+
+def runJobs(jobs: List[Job], data_dir: Optional[str] = None) -> List[Tuple[bool, Any]]:
+    """
+    executed in the worker processes: solve a batch of jobs, graph files are read from data_dir
+    Return:
+        (True, trial record) or (False, error message) for every job
+    """
+    results = []
+    for job in jobs:
+        try:
+            results.append((True, sweep.runTrial(makeCell(job, data_dir), job.get("seed", 0))))
+        except Exception as e:
+            results.append((False, f"{type(e).__name__}: {e}"))
+    return results
+
+
+class JobService:
+    """
+    Input:
+        - processes: number of worker processes ( default: os.cpu_count() )
+        - max_queue: number of queued jobs before submit() blocks
+        - batch_size, batch_nodes: limits of a batch of small jobs ( number of jobs, total nodes )
+        - linger: seconds the dispatcher waits for more jobs before sending an incomplete batch
+        - data_dir: directory of the graph files jobs may load, None rejects every graph file
+    """
+
+    def __init__(self, processes: Optional[int] = None, max_queue: int = 1024, batch_size: int = 64,
+                 batch_nodes: int = 4096, linger: float = 0.002, data_dir: Optional[str] = None) -> None:
+        self.processes = processes or os.cpu_count()
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_nodes = batch_nodes
+        self.linger = linger
+        self.data_dir = data_dir
+        self.counts = dict.fromkeys(("submitted", "completed", "failed", "batches"), 0)
+        self._ids = itertools.count()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Semaphore] = None
+        self._batches: set = set()
+
+    async def start(self) -> "JobService":
+        # the workers are started on demand, forked workers would inherit the client sockets
+        # open at that time and keep those connections alive after the service closes them
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=context)
+        self._queue = asyncio.Queue(self.max_queue)
+        self._inflight = asyncio.Semaphore(2 * self.processes)
+        self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+        return self
+
+    async def close(self) -> None:
+        """wait for the submitted jobs, then stop the workers"""
+        await self._queue.join()
+        self._dispatcher.cancel()
+        try:
+            await self._dispatcher
+        except asyncio.CancelledError:
+            pass
+        if self._batches:
+            await asyncio.gather(*self._batches)
+        self._pool.shutdown()
+
+    async def __aenter__(self) -> "JobService":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def submit(self, job: Job, progress: Optional[Progress] = None) -> asyncio.Future:
+        """
+        queue a job, waiting while the queue is full
+        Return:
+            a future of the trial record, it raises JobError if the job failed
+        Raise:
+            ValueError if the job names an unknown game, graph source or solver,
+            or a graph file outside the data directory
+        """
+        makeCell(job, self.data_dir)
+        if "id" not in job:
+            job = dict(job, id=next(self._ids))
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((job, future, progress))
+        self.counts["submitted"] += 1
+        if progress:
+            progress("queued", job["id"], {})
+        return future
+
+    async def solve(self, job: Job, progress: Optional[Progress] = None) -> Record:
+        """submit a job and wait for its record"""
+        return await (await self.submit(job, progress))
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.counts, queued=self._queue.qsize(), running_batches=len(self._batches))
+
+    async def _dispatch(self) -> None:
+        queue = self._queue
+        held = None
+        while True:
+            # the job that did not fit into the last batch starts the next one
+            first = held if held is not None else await queue.get()
+            held = None
+            batch = [first]
+            nodes = jobSize(first[0])
+            deadline = time.monotonic() + self.linger
+            while nodes < self.batch_nodes and len(batch) < self.batch_size:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                size = jobSize(item[0])
+                if nodes + size > self.batch_nodes:
+                    held = item
+                    break
+                batch.append(item)
+                nodes += size
+            await self._inflight.acquire()
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run(self, batch: List[Tuple[Job, asyncio.Future, Optional[Progress]]]) -> None:
+        self.counts["batches"] += 1
+        try:
+            for job, _, progress in batch:
+                if progress:
+                    progress("running", job["id"], {"batch": len(batch)})
+            loop = asyncio.get_running_loop()
+            try:
+                results = await loop.run_in_executor(self._pool, runJobs,
+                                                   [job for job, _, _ in batch], self.data_dir)
+            except Exception as e:
+                # the worker died, e.g. BrokenProcessPool
+                results = [(False, f"{type(e).__name__}: {e}")] * len(batch)
+            for (job, future, progress), (ok, value) in zip(batch, results):
+                self.counts["completed" if ok else "failed"] += 1
+                if progress:
+                    progress("result" if ok else "error", job["id"], {"result": value} if ok else {"error": value})
+                if not future.done():
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(JobError(value))
+                        # nobody may await the future of a job submitted over TCP
+                        future.exception()
+        finally:
+            self._inflight.release()
+            for _ in batch:
+                self._queue.task_done()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        """listen for clients speaking the line protocol ( see module docstring ), port 0 picks a free port"""
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        def send(event: str, job_id: Any, payload: Dict[str, Any]) -> None:
+            if not writer.is_closing():
+                writer.write(json.dumps(dict(payload, event=event, id=job_id)).encode() + b"\n")
+
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                # the job of this line, its id is echoed back if it is rejected
+                job = None
+                try:
+                    message = json.loads(line)
+                    if not isinstance(message, dict):
+                        raise ValueError("a message must be a JSON object")
+                    if message.get("op", "submit") == "stats":
+                        send("stats", None, {"stats": self.stats()})
+                    else:
+                        job = message["job"]
+                        if not isinstance(job, dict):
+                            job = None
+                            raise ValueError("a job must be a JSON object")
+                        # blocks while the queue is full, the client's writes then pile up in TCP
+                        future = await self.submit(job, send)
+                        pending.add(future)
+                        future.add_done_callback(pending.discard)
+                except (ValueError, KeyError, TypeError) as e:
+                    send("error", job.get("id") if job is not None else None,
+                         {"error": f"{type(e).__name__}: {e}"})
+                await writer.drain()
+            # the client half-closed the connection, answer its remaining jobs first
+            if pending:
+                await asyncio.wait(pending)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+class JobClient:
+    """
+    Client of a JobService listening on TCP
+        client = await JobClient.connect(port=8765)
+        record = await client.solve(job)
+        await client.close()
+    Input:
+        - progress: optional callback progress(event, job id, payload) for every event
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 progress: Optional[Progress] = None) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.progress = progress
+        self._ids = itertools.count()
+        self._futures: Dict[Any, asyncio.Future] = {}
+        self._stats: List[asyncio.Future] = []
+        self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    @classmethod
+    async def connect(cls, host: str = "127.0.0.1", port: int = 8765, progress: Optional[Progress] = None) -> "JobClient":
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, progress)
+
+    async def _listen(self) -> None:
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                event = message.pop("event")
+                job_id = message.pop("id")
+                if event == "stats":
+                    self._stats.pop(0).set_result(message["stats"])
+                    continue
+                if self.progress:
+                    self.progress(event, job_id, message)
+                if event in ("result", "error"):
+                    future = self._futures.pop(job_id, None)
+                    if future is None or future.done():
+                        continue
+                    if event == "result":
+                        future.set_result(message["result"])
+                    else:
+                        future.set_exception(JobError(message["error"]))
+        finally:
+            for future in itertools.chain(self._futures.values(), self._stats):
+                if not future.done():
+                    future.set_exception(ConnectionError("connection to the job service closed"))
+
+    async def submit(self, job: Job) -> asyncio.Future:
+        """send a job, return a future of its record ( waits while the connection is backed up )"""
+        if "id" not in job:
+            job = dict(job, id=next(self._ids))
+        future = asyncio.get_running_loop().create_future()
+        self._futures[job["id"]] = future
+        self.writer.write(json.dumps({"op": "submit", "job": job}).encode() + b"\n")
+        await self.writer.drain()
+        return future
+
+    async def solve(self, job: Job) -> Record:
+        return await (await self.submit(job))
+
+    async def stats(self) -> Dict[str, Any]:
+        future = asyncio.get_running_loop().create_future()
+        self._stats.append(future)
+        self.writer.write(b'{"op": "stats"}\n')
+        await self.writer.drain()
+        return await future
+
+    async def close(self) -> None:
+        # half-close, the service closes the connection once it has read everything
+        self.writer.write_eof()
+        await self._listener
+        self.writer.close()
+
+
+async def _loadTest(args) -> None:
+    service = JobService(processes=args.processes, max_queue=args.queue, batch_size=args.batch_size)
+    async with service:
+        server = await service.serve(port=args.port)
+        port = server.sockets[0].getsockname()[1]
+        latencies: List[float] = []
+
+        async def client(c: int) -> None:
+            connection = await JobClient.connect(port=port)
+            futures = []
+            for i in range(c, args.jobs, args.clients):
+                job = {"game": "K_DominationGame", "game_kwargs": {"k": 2}, "seed": i,
+                       "graph_kwargs": {"n": args.n, "k": 4, "link_rewiring_prob": 0.2}}
+                sent = time.perf_counter()
+                future = await connection.submit(job)
+                future.add_done_callback(lambda _, sent=sent: latencies.append(time.perf_counter() - sent))
+                futures.append(future)
+            await asyncio.gather(*futures)
+            await connection.close()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(c) for c in range(args.clients)))
+        elapsed = time.perf_counter() - start
+        server.close()
+        await server.wait_closed()
+    latencies.sort()
+    print(f"batch_size {args.batch_size:3d}: {args.jobs} jobs in {elapsed:.2f}s "
+          f"({args.jobs / elapsed:.0f} jobs/s), {service.counts['batches']} batches, "
+          f"latency p50 {latencies[len(latencies) // 2] * 1000:.0f}ms p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f}ms")
+
+
+async def _serve(args) -> None:
+    async with JobService(processes=args.processes, max_queue=args.queue, batch_size=args.batch_size,
+                          data_dir=args.data_dir) as service:
+        server = await service.serve(args.host, args.port)
+        print(f"listening on {server.sockets[0].getsockname()}")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="local game solving service")
+    parser.add_argument("command", choices=("serve", "loadtest"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--queue", type=int, default=1024)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--data-dir", default=None, help="serve: directory of the graph files jobs may load")
+    parser.add_argument("--jobs", type=int, default=5000, help="loadtest: number of jobs")
+    parser.add_argument("--clients", type=int, default=4, help="loadtest: number of connections")
+    parser.add_argument("--n", type=int, default=30, help="loadtest: nodes per game")
+    args = parser.parse_args()
+    if args.command == "serve":
+        asyncio.run(_serve(args))
+    else:
+        args.port = 0
+        asyncio.run(_loadTest(args))
@@ -0,0 +1,304 @@
+"""
+Compact move traces of a solve, and their replay
+
+    recorder = TraceRecorder().attach(game)
+    game.solve(worklistSolver)
+    trace = recorder.detach()          # MoveTrace: initial profile + (player, action) per move
+    trace.save("run.trace")
+
+    replay = TraceReplay(MoveTrace.load("run.trace"), fresh_game, checkpoint_every=10000)
+    replay.seek(12345)                 # fresh_game is now in the state after 12345 moves
+    graphviz.Source(replay.toDot(around=some_player))
+    for step, value in replay.statistics(lambda g: g.underDominated, every=1000): ...
+
+Players and actions are stored as int32 codes: players by their index in the recorded
+player list, actions by their index in a table of the distinct actions seen, so a move
+takes 8 bytes and the profile 4 bytes per player. Recording wraps setAction of a single game
+instance ( like metrics.SolverMetrics ), the graph must not change while recording.
+"""
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import pickle
+import struct
+
+import graph
+from graph_games import Game
+
+Player = Any
+Action = Any
+
+MAGIC = b"GGTRACE1"
+# magic, number of players, number of moves, length of the pickled labels
+_HEADER = struct.Struct("<8sqqq")
+
+
+class MoveTrace:
+    """
+    Recorded solve: the initial profile and the sequence of moves.
+        - players: player of every index
+        - actions: action of every action code
+        - initial: action code of every player before the first move
+        - movePlayers, moveActions: player index and new action code of every move
+    """
+
+    def __init__(self, players: List[Player], actions: List[Action], initial: array,
+                 movePlayers: Optional[array] = None, moveActions: Optional[array] = None) -> None:
+        self.players = players
+        self.actions = actions
+        self.initial = initial
+        self.movePlayers = array('i') if movePlayers is None else movePlayers
+        self.moveActions = array('i') if moveActions is None else moveActions
+
+    def __len__(self) -> int:
+        """number of moves"""
+        return len(self.movePlayers)
+
+    def __getitem__(self, step: int) -> Tuple[Player, Action]:
+        """(player, new action) of a move"""
+        return self.players[self.movePlayers[step]], self.actions[self.moveActions[step]]
+
+    def initialProfile(self) -> Dict[Player, Action]:
+        actions = self.actions
+        return {p: actions[a] for p, a in zip(self.players, self.initial)}
+
+    def moveCounts(self) -> array:
+        """number of moves of every player ( by player index )"""
+        counts = array('q', bytes(8 * len(self.players)))
+        for p in self.movePlayers:
+            counts[p] += 1
+        return counts
+
+    def nbytes(self) -> int:
+        """size of the code arrays"""
+        return 4 * (len(self.initial) + len(self.movePlayers) + len(self.moveActions))
+
+    def save(self, path: str) -> None:
+        """
+        write the trace, little-endian: a 32 byte header ( magic b"GGTRACE1", number of players,
+        number of moves, size of the labels ), the int32 initial codes, the int32 player codes and
+        action codes of the moves, then the players and actions pickled
+        """
+        labels = pickle.dumps((self.players, self.actions), protocol=pickle.HIGHEST_PROTOCOL)
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, len(self.players), len(self), len(labels)))
+            for codes in (self.initial, self.movePlayers, self.moveActions):
+                codes = array('i', codes)
+                if struct.pack("=i", 1) != struct.pack("<i", 1):
+                    codes.byteswap()
+                codes.tofile(f)
+            f.write(labels)
+
+    @classmethod
+    def load(cls, path: str) -> "MoveTrace":
+        with open(path, "rb") as f:
+            magic, num_players, num_moves, labels_size = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a move trace file")
+            codes = []
+            for length in (num_players, num_moves, num_moves):
+                a = array('i')
+                a.fromfile(f, length)
+                if struct.pack("=i", 1) != struct.pack("<i", 1):
+                    a.byteswap()
+                codes.append(a)
+            players, actions = pickle.loads(f.read(labels_size))
+        return cls(players, actions, *codes)
+
+
+class TraceRecorder:
+    """
+    Record every move of a game into a MoveTrace.
+    A move is a top-level setAction call ( the trial setAction calls made inside getUtils are
+    not moves ). The solvers only call setAction to change an action, a setAction that keeps the
+    action is recorded as well and replays as a no-op.
+    The cost per move is a wrapper call, two dict lookups and two array appends.
+    """
+
+    def __init__(self) -> None:
+        self.game: Optional[Game] = None
+        self.trace: Optional[MoveTrace] = None
+        # the instance attributes replaced by attach ( e.g. the wrappers of a metrics.SolverMetrics )
+        self._replaced: Dict[str, Any] = {}
+
+    def attach(self, game: Game) -> "TraceRecorder":
+        """record the current profile of game and wrap its setAction, return self"""
+        assert self.game is None, "already attached"
+        self.game = game
+        players = list(game.getPlayers())
+        index = {p: i for i, p in enumerate(players)}
+        actions: List[Action] = []
+        codes: Dict[Action, int] = {}
+
+        def code(action: Action) -> int:
+            c = codes.get(action)
+            if c is None:
+                c = codes[action] = len(actions)
+                actions.append(action)
+            return c
+
+        profile = game.getProfile()
+        trace = self.trace = MoveTrace(players, actions, array('i', (code(profile[p]) for p in players)))
+        appendPlayer, appendAction = trace.movePlayers.append, trace.moveActions.append
+        setAction = game.setAction
+        getUtils = game.getUtils
+        nested = [0]
+
+        def recordedSetAction(player: Player, action: Action) -> None:
+            if not nested[0]:
+                appendPlayer(index[player])
+                try:
+                    appendAction(codes[action])
+                except KeyError:
+                    appendAction(code(action))
+            setAction(player, action)
+
+        def unrecordedGetUtils(player: Player, actions: Iterable[Action]) -> Any:
+            nested[0] += 1
+            try:
+                return getUtils(player, actions)
+            finally:
+                nested[0] -= 1
+
+        self._replaced = {name: game.__dict__[name] for name in ("setAction", "getUtils")
+                          if name in game.__dict__}
+        game.setAction = recordedSetAction
+        game.getUtils = unrecordedGetUtils
+        return self
+
+    def detach(self) -> MoveTrace:
+        """restore the methods of the game ( and the wrappers attached before the recorder ), return the trace"""
+        for name in ("setAction", "getUtils"):
+            self.game.__dict__.pop(name, None)
+        self.game.__dict__.update(self._replaced)
+        self._replaced = {}
+        self.game = None
+        return self.trace
+
+
+def solveWithTrace(g: Game, solver: Callable[[Game], Any]) -> Tuple[Any, MoveTrace]:
+    """
+    solve the game while recording its moves
+    Return:
+        (result of the solver, MoveTrace)
+    """
+    recorder = TraceRecorder().attach(g)
+    try:
+        result = g.solve(solver)
+    finally:
+        trace = recorder.detach()
+    return result, trace
+
+
+class TraceReplay:
+    """
+    Replay a MoveTrace on a game, with random access to the state after any number of moves.
+    Input:
+        - trace: the MoveTrace
+        - game: a game on the same graph as the recorded one, its profile is overwritten
+            with the initial profile of the trace
+        - checkpoint_every: keep a game.snapshot() every this many moves,
+            seek(step) restores the last checkpoint before step and replays the remaining moves,
+            so it costs at most checkpoint_every moves once the checkpoints up to step exist.
+            Checkpoints are taken lazily the first time the replay passes them
+    """
+
+    def __init__(self, trace: MoveTrace, game: Game, checkpoint_every: int = 10000) -> None:
+        assert checkpoint_every >= 1
+        self.trace = trace
+        self.game = game
+        self.checkpoint_every = checkpoint_every
+        game.setProfile(trace.initialProfile())
+        # checkpoints[i] is the snapshot after i * checkpoint_every moves
+        self.checkpoints: List[Any] = [game.snapshot()]
+        # number of moves applied to game
+        self.step = 0
+
+    def __len__(self) -> int:
+        return len(self.trace)
+
+    def _forward(self, step: int) -> None:
+        trace = self.trace
+        players, actions = trace.players, trace.actions
+        movePlayers, moveActions = trace.movePlayers, trace.moveActions
+        setAction = self.game.setAction
+        every = self.checkpoint_every
+        checkpoints = self.checkpoints
+        for i in range(self.step, step):
+            setAction(players[movePlayers[i]], actions[moveActions[i]])
+            if (i + 1) % every == 0 and (i + 1) // every == len(checkpoints):
+                checkpoints.append(self.game.snapshot())
+        self.step = step
+
+    def seek(self, step: int) -> Game:
+        """bring the game to the state after `step` moves ( negative steps count from the end ), return it"""
+        if step < 0:
+            step += len(self.trace)
+        assert 0 <= step <= len(self.trace), f"step {step} out of range"
+        # from the latest checkpoint at or before step, unless the game is already closer
+        checkpoint = min(step // self.checkpoint_every, len(self.checkpoints) - 1)
+        start = checkpoint * self.checkpoint_every
+        if not start <= self.step <= step:
+            self.game.restore(self.checkpoints[checkpoint])
+            self.step = start
+        self._forward(step)
+        return self.game
+
+    def moves(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, Player, Action]]:
+        """(step, player, new action) of the moves in range(start, stop), the game is not touched"""
+        stop = len(self.trace) if stop is None else stop
+        for i in range(start, stop):
+            player, action = self.trace[i]
+            yield i + 1, player, action
+
+    def statistics(self, statistic: Callable[[Game], Any], start: int = 0, stop: Optional[int] = None,
+                   every: int = 1) -> Iterator[Tuple[int, Any]]:
+        """
+        lazily replay the moves and yield (step, statistic(game)) for every `every`-th step
+        in range(start, stop + 1), e.g. statistic = lambda g: g.underDominated
+        """
+        stop = len(self.trace) if stop is None else stop
+        for step in range(start, stop + 1, every):
+            yield step, statistic(self.seek(step))
+
+    def toDot(self, step: Optional[int] = None, around: Optional[Player] = None, radius: int = 2,
+              recent: int = 0) -> str:
+        """
+        graphviz source ( render with graphviz.Source ) of the state after `step` moves
+        ( default: the current state )
+        Input:
+            - around, radius: only draw the players within radius hops of `around`,
+                rendering the whole graph does not scale past a few hundred players
+            - recent: outline the players that moved in the last `recent` moves
+        Players whose action is another player ( matching proposals ) get an arrow to it,
+        players with action True are filled, other actions are shown in the label
+        """
+        game = self.game if step is None else self.seek(step)
+        g = game.graph
+        shown = list(game.getPlayers()) if around is None else list(graph.neighborhood(g, around, radius))
+        names = {p: i for i, p in enumerate(shown)}
+        moved = set(player for _, player, _ in self.moves(max(0, self.step - recent), self.step))
+        lines = [f'digraph "step {self.step}" {{', '  node [shape=circle];', '  edge [dir=none];']
+        proposals = []
+        for p in shown:
+            action = game.getAction(p)
+            attrs = [f'label="{p}"']
+            if isinstance(action, bool):
+                if action:
+                    attrs.append('style=filled fillcolor=pink')
+            elif action is not None and action in names:
+                proposals.append((names[p], names[action]))
+            elif action is not None:
+                attrs[0] = f'label="{p}\\n{action}"'
+            if p in moved:
+                attrs.append('color=red penwidth=2')
+            lines.append(f'  n{names[p]} [{" ".join(attrs)}];')
+        proposed = set(proposals)
+        for p in shown:
+            i = names[p]
+            for q in g.neighbors(p):
+                j = names.get(q)
+                if j is not None and i < j and (i, j) not in proposed and (j, i) not in proposed:
+                    lines.append(f'  n{i} -> n{j};')
+        lines.extend(f'  n{i} -> n{j} [dir=forward color=blue];' for i, j in proposals)
+        lines.append("}")
+        return "\n".join(lines)
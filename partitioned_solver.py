@@ -0,0 +1,468 @@
+"""
+Partitioned best-response solver for graphs that are too large for a single solver loop
+
+The graph is split into shards ( partitionGraph ), every shard is owned by a worker process.
+The CSR arrays of the graph, the shard of every node and the actions of the boundary players
+live in shared memory; each worker builds a local game on its shard plus the ghost nodes
+within interactionRadius + 1 hops ( so that the degrees and counters its players read are
+exact ) and only reads the actions of its ghost nodes back from shared memory.
+
+A player is interior if every node within interactionRadius hops is in its own shard, its
+utilities then only depend on its shard, and its moves are invisible to the other shards.
+The other ( boundary ) players get a global distance-2 colouring. Every round
+    1. each worker moves its interior players until they are all best-responding
+    2. for every colour: each worker refreshes its ghost actions, then moves its unstable
+        boundary players of that colour and publishes their new actions
+players of one colour are more than 2 hops apart, so each step is equivalent to some
+sequential order of best-response moves. The solve has converged once a whole round makes
+no move: every player is then best-responding.
+
+    with PartitionedSolver(cg, K_DominationGame, {"k": 2}, num_shards=4) as solver:
+        result = solver.run()       # SolveResult
+        actions = solver.actions    # action of every node, see PartitionedSolver
+"""
+from array import array
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple, Type
+import multiprocessing
+import random
+import time
+
+import graph
+from graph import CompactGraph
+from graph_games import Game, K_DominationGame, AsymmetricIDSGame, MaximalMatchingGame
+from game_solver import bestResponseMove, SolveResult
+
+
+def partitionGraph(g: CompactGraph, num_shards: int, passes: int = 3, imbalance: float = 0.05) -> array:
+    """
+    split the nodes into num_shards shards of about equal size
+    The breadth-first order of the nodes is cut into contiguous blocks, then a few label
+    propagation passes move nodes to the shard of most of their neighbors, as long as that
+    shard stays within (1 + imbalance) times the average size
+    Return:
+        the shard of every node
+    """
+    n = len(g.nodes)
+    capacity = max(1, -(-n // num_shards))
+    owner = array('i', bytes(4 * n))
+    seen = bytearray(n)
+    rank = 0
+    for root in range(n):
+        if seen[root]:
+            continue
+        seen[root] = 1
+        queue = deque([root])
+        while queue:
+            v = queue.popleft()
+            owner[v] = min(rank // capacity, num_shards - 1)
+            rank += 1
+            for u in g.neighbors(v):
+                if not seen[u]:
+                    seen[u] = 1
+                    queue.append(u)
+    sizes = [0] * num_shards
+    for s in owner:
+        sizes[s] += 1
+    limit = int(capacity * (1 + imbalance))
+    for _ in range(passes):
+        moved = 0
+        for v in range(n):
+            current = owner[v]
+            counts: Dict[int, int] = {}
+            for u in g.neighbors(v):
+                s = owner[u]
+                counts[s] = counts.get(s, 0) + 1
+            if not counts:
+                continue
+            best = max(counts, key=lambda s: (counts[s], s == current))
+            if best != current and counts[best] > counts.get(current, 0) and sizes[best] < limit:
+                owner[v] = best
+                sizes[current] -= 1
+                sizes[best] += 1
+                moved += 1
+        if not moved:
+            break
+    return owner
+
+
+def cutEdges(g: CompactGraph, owner: array) -> int:
+    """number of edges between two shards"""
+    return sum(1 for v in g.nodes for u in g.neighbors(v) if v < u and owner[u] != owner[v])
+
+
+def boundaryColoring(g: CompactGraph, owner: array, radius: int = 2) -> Tuple[array, int]:
+    """
+    greedy distance-2 colouring of the boundary nodes ( with a node of another shard within
+    `radius` hops ), the interior nodes get colour -1
+    Return:
+        (colour of every node, number of colours)
+    """
+    n = len(g.nodes)
+    # nodes within radius hops of another shard: grow from the endpoints of the cut edges
+    # inside their own shard
+    boundary = bytearray(n)
+    frontier = [v for v in g.nodes if any(owner[u] != owner[v] for u in g.neighbors(v))]
+    for v in frontier:
+        boundary[v] = 1
+    for _ in range(radius - 1):
+        next_frontier = []
+        for v in frontier:
+            for u in g.neighbors(v):
+                if not boundary[u] and owner[u] == owner[v]:
+                    boundary[u] = 1
+                    next_frontier.append(u)
+        frontier = next_frontier
+    color = array('i', [-1]) * n
+    num_colors = 0
+    for v in range(n):
+        if not boundary[v]:
+            continue
+        used = set(color[u] for u in graph.neighborhood(g, v, 2))
+        c = 0
+        while c in used:
+            c += 1
+        color[v] = c
+        num_colors = max(num_colors, c + 1)
+    return color, num_colors
+
+
+def _share(values: array) -> Tuple[shared_memory.SharedMemory, str, int]:
+    """copy an array into a new shared memory block"""
+    shm = shared_memory.SharedMemory(create=True, size=max(1, values.itemsize * len(values)))
+    view = shm.buf[:values.itemsize * len(values)].cast(values.typecode)
+    view[:] = values
+    view.release()
+    return shm, values.typecode, len(values)
+
+
+def _view(shared: Tuple[shared_memory.SharedMemory, str, int]) -> memoryview:
+    shm, typecode, length = shared
+    return shm.buf[:array(typecode).itemsize * length].cast(typecode)
+
+
+class _Shard:
+    """ state of one worker: the local game of a shard and its ghost nodes """
+
+    def __init__(self, shard: int, g: CompactGraph, owner: memoryview, color: memoryview,
+                 actions: memoryview, game_class: Type[Game], game_kwargs: Dict[str, Any],
+                 constants: Dict[str, Any], seed: int) -> None:
+        self.actions = actions
+        self.rng = random.Random(seed)
+        radius = game_class.interactionRadius
+        owned = [v for v in g.nodes if owner[v] == shard]
+        # hop distance from the shard, up to radius + 1
+        depth = dict.fromkeys(owned, 0)
+        frontier = owned
+        for d in range(1, radius + 2):
+            next_frontier = []
+            for v in frontier:
+                for u in g.neighbors(v):
+                    if u not in depth:
+                        depth[u] = d
+                        next_frontier.append(u)
+            frontier = next_frontier
+        # local graph: every edge of the nodes within radius hops, so their degrees are exact
+        self.ids = list(depth)
+        self.index = {v: i for i, v in enumerate(self.ids)}
+        src, dst = array('i'), array('i')
+        for v, d in depth.items():
+            if d <= radius:
+                for u in g.neighbors(v):
+                    src.append(self.index[v])
+                    dst.append(self.index[u])
+        local = CompactGraph.fromEdges(len(self.ids), src, dst, self.ids)
+        self.game = game_class(graph=local, **game_kwargs)
+        # constants derived from the whole graph
+        for name, value in constants.items():
+            setattr(self.game, name, value)
+        self.matching = isinstance(self.game, MaximalMatchingGame)
+
+        self.ghosts = [v for v, d in depth.items() if 0 < d <= radius]
+        self.interior = [self.index[v] for v in owned if color[v] < 0]
+        self.interior_set = set(self.interior)
+        self.boundary: Dict[int, List[int]] = {}
+        for v in owned:
+            if color[v] >= 0:
+                self.boundary.setdefault(color[v], []).append(self.index[v])
+        for v in owned:
+            self.game.setAction(self.index[v], self.decode(actions[v]))
+        self.seen = array('q', (actions[v] for v in self.ghosts))
+        for v, a in zip(self.ghosts, self.seen):
+            self.game.setAction(self.index[v], self.decode(a))
+
+    def encode(self, action: Any) -> int:
+        if self.matching:
+            return -1 if action is None else self.ids[action]
+        return int(action)
+
+    def decode(self, value: int) -> Any:
+        if self.matching:
+            return None if value < 0 else self.index[value]
+        return bool(value)
+
+    def refreshGhosts(self) -> None:
+        """read the actions of the ghost nodes that changed since the last refresh"""
+        actions, seen = self.actions, self.seen
+        for i, v in enumerate(self.ghosts):
+            a = actions[v]
+            if a != seen[i]:
+                seen[i] = a
+                self.game.setAction(self.index[v], self.decode(a))
+
+    def solveInterior(self) -> int:
+        """move the interior players until they are all best-responding, return the number of moves"""
+        pending = list(self.interior)
+        self.rng.shuffle(pending)
+        queued = set(pending)
+        moves = 0
+        while pending:
+            p = pending.pop()
+            queued.discard(p)
+            if bestResponseMove(self.game, p):
+                moves += 1
+                for q in self.game.getAffectedPlayers(p):
+                    if q in self.interior_set and q not in queued:
+                        queued.add(q)
+                        pending.append(q)
+        return moves
+
+    def moveBoundary(self, color: int) -> int:
+        """move the unstable boundary players of one colour and publish their actions"""
+        moves = 0
+        for p in self.boundary.get(color, ()):
+            if bestResponseMove(self.game, p):
+                moves += 1
+                self.actions[self.ids[p]] = self.encode(self.game.getAction(p))
+        return moves
+
+    def publish(self) -> None:
+        """write the actions of every player of the shard"""
+        for p in self.interior:
+            self.actions[self.ids[p]] = self.encode(self.game.getAction(p))
+
+
+def _worker(conn, shard: int, shared: Dict[str, Any], game_class: Type[Game], game_kwargs: Dict[str, Any],
+            constants: Dict[str, Any], seed: int) -> None:
+    views = {name: _view(shared[name]) for name in ("offsets", "targets", "owner", "color", "actions")}
+    try:
+        g = CompactGraph(views["offsets"], views["targets"], range(len(views["owner"])))
+        state = _Shard(shard, g, views["owner"], views["color"], views["actions"],
+                       game_class, game_kwargs, constants, seed)
+        conn.send(len(state.ids))
+        while True:
+            command, arg = conn.recv()
+            if command == "interior":
+                conn.send(state.solveInterior())
+            elif command == "color":
+                state.refreshGhosts()
+                conn.send(state.moveBoundary(arg))
+            else:
+                state.publish()
+                conn.send(0)
+                break
+        del state, g
+    finally:
+        for view in views.values():
+            view.release()
+        conn.close()
+
+
+def _constants(game_class: Type[Game], game_kwargs: Dict[str, Any], g: CompactGraph) -> Dict[str, Any]:
+    """attributes of the game computed from the whole graph, set on the local games"""
+    max_degree = max((g.degree(v) for v in g.nodes), default=0)
+    if issubclass(game_class, AsymmetricIDSGame):
+        return {"gamma": max_degree * game_kwargs.get("alpha", 2) + 1}
+    if issubclass(game_class, MaximalMatchingGame):
+        return {"maxDeg": max_degree}
+    return {}
+
+
+class PartitionedSolver:
+    """
+    Solve a game on a CompactGraph with one worker process per shard ( see module docstring ).
+    Input:
+        - g: the graph, its nodes are the players
+        - game_class, game_kwargs: the game, built as game_class(graph=..., **game_kwargs)
+            ( K_DominationGame, AsymmetricIDSGame or MaximalMatchingGame )
+        - num_shards: number of shards and worker processes
+        - initial: optional initial action of every node, encoded as in `actions`,
+            by default every node starts with False / None
+        - owner: optional shard of every node, by default partitionGraph(g, num_shards)
+        - seed: seed of the order in which the workers visit their interior players
+    After run(), `actions` holds the action of every node: 0 / 1 for the domination games,
+    the proposed node or -1 for MaximalMatchingGame.
+    Use as a context manager, or call close(), to stop the workers and free the shared memory.
+    """
+
+    def __init__(self, g: CompactGraph, game_class: Type[Game], game_kwargs: Optional[Dict[str, Any]] = None,
+                 num_shards: int = 4, initial: Optional[array] = None, owner: Optional[array] = None,
+                 seed: int = 0) -> None:
+        assert game_class.interactionRadius <= 2
+        game_kwargs = game_kwargs or {}
+        n = len(g.nodes)
+        neutral = -1 if issubclass(game_class, MaximalMatchingGame) else 0
+        self.owner = partitionGraph(g, num_shards) if owner is None else owner
+        color, self.num_colors = boundaryColoring(g, self.owner, game_class.interactionRadius)
+        self.stats: Dict[str, Any] = {"shards": num_shards, "cut_edges": cutEdges(g, self.owner),
+                                      "boundary": sum(1 for c in color if c >= 0), "colors": self.num_colors}
+        self._shared: Dict[str, Any] = {}
+        self._workers: List[Any] = []
+        self._conns: List[Any] = []
+        self._actions: Optional[memoryview] = None
+        self._final: Optional[array] = None
+        try:
+            self._shared["offsets"] = _share(array('q', g.offsets))
+            self._shared["targets"] = _share(array('i' if n < 2**31 else 'q', g.targets))
+            self._shared["owner"] = _share(self.owner)
+            self._shared["color"] = _share(color)
+            self._shared["actions"] = _share(array('q', [neutral]) * n if initial is None else array('q', initial))
+            self._actions = _view(self._shared["actions"])
+
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("fork" if "fork" in methods else None)
+            constants = _constants(game_class, game_kwargs, g)
+            for shard in range(num_shards):
+                parent, child = context.Pipe()
+                worker = context.Process(target=_worker, daemon=True, args=(
+                    child, shard, self._shared, game_class, game_kwargs, constants, seed * num_shards + shard))
+                worker.start()
+                child.close()
+                self._workers.append(worker)
+                self._conns.append(parent)
+            # size of every local game ( shard plus ghost nodes )
+            self.stats["local_nodes"] = [conn.recv() for conn in self._conns]
+        except BaseException:
+            self.close()
+            raise
+
+    def _broadcast(self, command: str, arg: Any = None) -> int:
+        for conn in self._conns:
+            conn.send((command, arg))
+        return sum(conn.recv() for conn in self._conns)
+
+    def run(self, max_rounds: Optional[int] = None) -> SolveResult:
+        """
+        run rounds until no player moves, or max_rounds rounds, then stop the workers
+        Return:
+            a SolveResult ( CONVERGED or BUDGET_EXHAUSTED ), self.stats["rounds"] is the number of rounds
+        """
+        assert self._conns, "the workers have already been stopped"
+        start = time.perf_counter()
+        moves = 0
+        rounds = 0
+        status = SolveResult.BUDGET_EXHAUSTED
+        while max_rounds is None or rounds < max_rounds:
+            rounds += 1
+            round_moves = self._broadcast("interior")
+            for c in range(self.num_colors):
+                round_moves += self._broadcast("color", c)
+            moves += round_moves
+            if round_moves == 0:
+                status = SolveResult.CONVERGED
+                break
+        self._broadcast("stop")
+        self._stopWorkers()
+        self.stats["rounds"] = rounds
+        return SolveResult(status, moves, time.perf_counter() - start)
+
+    @property
+    def actions(self) -> array:
+        return array('q', self._actions) if self._final is None else self._final
+
+    def _stopWorkers(self) -> None:
+        for conn in self._conns:
+            conn.close()
+        for worker in self._workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+        self._conns, self._workers = [], []
+
+    def close(self) -> None:
+        """stop the workers and free the shared memory, `actions` is kept"""
+        self._stopWorkers()
+        if self._actions is not None:
+            self._final = array('q', self._actions)
+            self._actions.release()
+            self._actions = None
+        for shm, _, _ in self._shared.values():
+            shm.close()
+            shm.unlink()
+        self._shared = {}
+
+    def __enter__(self) -> "PartitionedSolver":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _gameKwargs(g: Game) -> Dict[str, Any]:
+    """constructor arguments of the game classes, read back from a game instance"""
+    if isinstance(g, AsymmetricIDSGame):
+        return {"alpha": g.alpha, "beta": g.beta, "compact_state": g.compact_state}
+    if isinstance(g, K_DominationGame):
+        return {"k": g.k, "alpha": g.alpha, "beta": g.beta, "compact_state": g.compact_state}
+    if isinstance(g, MaximalMatchingGame):
+        return {"deg_penalty": g.deg_penalty, "robbing_reward": g.robbing_reward}
+    raise TypeError(f"{type(g).__name__} is not supported by partitionedSolver")
+
+
+def partitionedSolver(g: Game, num_shards: int = 4, max_rounds: Optional[int] = None, seed: int = 0) -> SolveResult:
+    """
+    solve a game with PartitionedSolver, starting from its current profile, the final profile
+    is written back into the game
+    Input:
+        - g: a K_DominationGame, AsymmetricIDSGame or MaximalMatchingGame
+        - num_shards: number of shards and worker processes
+        - max_rounds: stop after this many rounds
+    Return:
+        a SolveResult
+    """
+    if isinstance(g.graph, CompactGraph):
+        # the players are the node indices
+        cg = g.graph
+        players = cg.nodes
+    else:
+        cg = g.graph.compact()
+        players = cg.labels
+    matching = isinstance(g, MaximalMatchingGame)
+
+    def encode(action):
+        if matching:
+            return -1 if action is None else action if players is cg.nodes else cg.index(action)
+        return int(action)
+    initial = array('q', (encode(g.getAction(players[v])) for v in cg.nodes))
+    with PartitionedSolver(cg, type(g), _gameKwargs(g), num_shards, initial, seed=seed) as solver:
+        result = solver.run(max_rounds)
+        actions = solver.actions
+    if matching:
+        g.setProfile({players[v]: None if a < 0 else players[a] for v, a in enumerate(actions)})
+    else:
+        g.setProfile({players[v]: bool(a) for v, a in enumerate(actions)})
+    return result
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="partitioned solver on a Watts-Strogatz graph")
+    parser.add_argument("--n", type=int, default=100000)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--p", type=float, default=0.01)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cg = next(graph.randomWSGraphs(1, args.n, args.k, args.p, seed=args.seed, compact=True))
+    print(f"graph: {time.perf_counter() - start:.2f}s")
+    for game_class, kwargs in ((K_DominationGame, {"k": 2}), (AsymmetricIDSGame, {}), (MaximalMatchingGame, {})):
+        start = time.perf_counter()
+        with PartitionedSolver(cg, game_class, kwargs, args.shards, seed=args.seed) as solver:
+            setup = time.perf_counter() - start
+            result = solver.run()
+        print(f"{game_class.__name__:20} setup {setup:6.2f}s solve {result.elapsed:6.2f}s "
+              f"moves {result.moves:8d} {result.status} {solver.stats}")
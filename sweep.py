@@ -0,0 +1,444 @@
+"""
+Parallel parameter sweeps over (game, graph) settings
+
+A sweep is described by a declarative grid: a list of cells, each cell is a dict
+    {
+        "game": K_DominationGame,               # a Game class from graph_games
+        "game_kwargs": {"k": 2},                # extra constructor arguments
+        "graph": graph.randomWSGraph,           # optional, a graph generator from graph.py
+        "graph_kwargs": {"n": 30, "k": 4, "link_rewiring_prob": 0.2},  # generator arguments, without seed
+        "trials": 100,                          # number of independent trials
+        "random_init": False,                   # call game.randomInit() before solving
+        "solver": bestResponseSolver,           # optional, a module-level solver function
+    }
+Solvers returning a SolveResult ( e.g. functools.partial(boundedSolver, max_seconds=60) )
+also get their status recorded, so a non-converging trial cannot hang a worker.
+With runSweep(..., output="results.csv") every trial is streamed to an append-only CSV file
+( see ResultWriter ), rerunning the same sweep with the same file resumes after the last
+completed trials, and iterRecords / loadColumns / aggregateResults read large result files
+without keeping every row in memory.
+
+Each trial gets a deterministic seed derived from (base seed, cell index, trial index),
+so a sweep gives the same results regardless of the number of worker processes.
+(set iteration order depends on the string hash seed, so workers are forked where possible
+to share it with the parent; set PYTHONHASHSEED to reproduce results across runs)
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from array import array
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+
+import graph
+import graph_games
+from game_solver import bestResponseSolver, SolveResult
+
+Cell = Dict[str, Any]
+Record = Dict[str, Any]
+
+
+def makeGrid(games: Iterable[Dict[str, Any]], rewiring_probs: Iterable[float],
+             n: int = 30, k: int = 4, trials: int = 100) -> List[Cell]:
+    """
+    build the cartesian product of game settings and rewiring probabilities
+    Input:
+        - games: dicts with at least a "game" entry, other entries are copied to the cell
+            ( e.g. {"game": MaximalMatchingGame, "game_kwargs": {...}, "random_init": True} )
+        - rewiring_probs: the rewiring probabilities of the Watts-Strogatz graphs
+        - n, k: Watts-Strogatz parameters
+        - trials: number of trials in each cell
+    """
+    grid = []
+    for game, p in itertools.product(games, rewiring_probs):
+        cell = {"trials": trials}
+        cell.update(game)
+        cell["graph_kwargs"] = {"n": n, "k": k, "link_rewiring_prob": p}
+        grid.append(cell)
+    return grid
+
+
+def trialSeed(base_seed: int, cell_index: int, trial: int) -> int:
+    """deterministic 63-bit seed of a single trial"""
+    return random.Random(f"{base_seed}:{cell_index}:{trial}").getrandbits(63)
+
+
+def runTrial(cell: Cell, seed: int) -> Record:
+    """build and solve a single game instance, return its statistics"""
+    start = time.perf_counter()
+    random.seed(seed)
+    g = cell.get("graph", graph.randomWSGraph)(**cell["graph_kwargs"])
+    game = cell["game"](graph=g, **cell.get("game_kwargs", {}))
+    if cell.get("random_init", False):
+        game.randomInit()
+    result = game.solve(cell.get("solver", bestResponseSolver))
+    record = {"seed": seed, "wall_time": time.perf_counter() - start}
+    if isinstance(result, SolveResult):
+        record["move_count"] = result.iterations
+        record["status"] = result.status
+        if not result.converged:
+            # the checkers below assert on unsolved games, an unsolved game is not a valid solution
+            record["valid"] = False
+            return record
+    else:
+        record["move_count"] = result
+    if isinstance(game, graph_games.K_DominationGame):
+        record["cardinality"] = game.dominationSetCardinality()
+        record["valid"] = game.checkDomination()
+        if isinstance(game, graph_games.AsymmetricIDSGame):
+            record["valid"] = record["valid"] and game.checkIndependence()
+    elif isinstance(game, graph_games.MaximalMatchingGame):
+        record["matching_count"] = game.numMatchingPairs()
+        record["valid"] = game.checkMaximalMatching()
+    return record
+
+
+def _runChunk(cell: Cell, cell_index: int, trials: List[Tuple[int, int]]) -> List[Record]:
+    # executed in the worker processes, trials are (trial index, seed) pairs
+    return [dict(runTrial(cell, seed), cell=cell_index, trial=trial) for trial, seed in trials]
+
+
+RESULT_COLUMNS = ("cell", "trial", "seed", "game", "game_kwargs", "graph", "graph_kwargs",
+                  "n", "k", "link_rewiring_prob", "move_count", "cardinality", "matching_count", "status", "valid", "wall_time")
+# columns of the result files written before the graph and graph_kwargs columns, still resumable
+_WS_RESULT_COLUMNS = ("cell", "trial", "seed", "game", "game_kwargs", "n", "k", "link_rewiring_prob",
+                      "move_count", "cardinality", "matching_count", "status", "valid", "wall_time")
+# columns taken from the cell, the others from the trial record
+_CELL_COLUMNS = ("game", "game_kwargs", "graph", "graph_kwargs", "n", "k", "link_rewiring_prob")
+_INT_COLUMNS = {"cell", "trial", "seed", "n", "k", "move_count", "cardinality", "matching_count"}
+_FLOAT_COLUMNS = {"link_rewiring_prob", "wall_time"}
+
+
+class ResultWriter:
+    """
+    Append-only CSV file with one row per trial ( columns RESULT_COLUMNS ).
+    Rows are buffered and written in bulk every `buffer_size` trials,
+    a partially written last line ( e.g. after a crash ) is dropped when the file is reopened.
+    A file from before the graph and graph_kwargs columns keeps its columns when it is resumed.
+    """
+
+    def __init__(self, path: str, buffer_size: int = 100) -> None:
+        self.path = path
+        self.buffer_size = buffer_size
+        self.buffer: List[List[Any]] = []
+        self.columns = RESULT_COLUMNS
+        # id of a cell -> (cell, values of the cell columns), the cell is kept so its id is not reused
+        self._cells: Dict[int, Tuple[Cell, Dict[str, Any]]] = {}
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            self._dropPartialLine()
+        self.file = open(path, "a", newline="")
+        self.writer = csv.writer(self.file)
+        if not exists:
+            self.writer.writerow(RESULT_COLUMNS)
+            self.file.flush()
+
+    def _dropPartialLine(self) -> None:
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            # look for the last newline in the tail of the file
+            pos = size
+            while pos > 0:
+                step = min(4096, pos)
+                f.seek(pos - step)
+                chunk = f.read(step)
+                i = chunk.rfind(b"\n")
+                if i >= 0:
+                    pos = pos - step + i + 1
+                    break
+                pos -= step
+            if pos < size:
+                f.truncate(pos)
+        with open(self.path, newline="") as f:
+            header = next(csv.reader(f), None)
+        header = tuple(header or ())
+        if header not in (RESULT_COLUMNS, _WS_RESULT_COLUMNS):
+            raise ValueError(f"{self.path} is not a sweep result file")
+        self.columns = header
+
+    def _cellValues(self, cell: Cell) -> Dict[str, Any]:
+        entry = self._cells.get(id(cell))
+        if entry is None or entry[0] is not cell:
+            graph_kwargs = cell["graph_kwargs"]
+            values = {
+                "game": cell["game"].__name__,
+                "game_kwargs": json.dumps(cell.get("game_kwargs", {}), sort_keys=True),
+                "graph": cell.get("graph", graph.randomWSGraph).__name__,
+                "graph_kwargs": json.dumps(graph_kwargs, sort_keys=True),
+            }
+            for c in ("n", "k", "link_rewiring_prob"):
+                values[c] = graph_kwargs.get(c)
+            entry = self._cells[id(cell)] = (cell, values)
+        return entry[1]
+
+    def write(self, cell: Cell, record: Record) -> None:
+        """buffer the record of one trial of the given cell"""
+        values = self._cellValues(cell)
+        row = [values[c] if c in _CELL_COLUMNS else record.get(c) for c in self.columns]
+        self.buffer.append(["" if v is None else v for v in row])
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self.writer.writerows(self.buffer)
+        self.buffer.clear()
+        self.file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.file.close()
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _parse(column: str, value: str) -> Any:
+    if column in _INT_COLUMNS:
+        return int(value)
+    if column in _FLOAT_COLUMNS:
+        return float(value)
+    if column == "valid":
+        return value == "True"
+    return value
+
+
+def iterRecords(path: str) -> Iterator[Record]:
+    """stream the records of a result file one at a time, empty fields are left out"""
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        for row in reader:
+            if len(row) != len(header):
+                # partially written last line
+                continue
+            yield {c: _parse(c, v) for c, v in zip(header, row) if v != ""}
+
+
+def loadColumns(path: str, columns: Iterable[str] = ("link_rewiring_prob", "move_count")) -> Dict[str, array]:
+    """
+    load numeric columns of a result file into compact float arrays ( 8 bytes per value,
+    missing values are NaN ), without materializing the rows
+    """
+    columns = list(columns)
+    data = {c: array('d') for c in columns}
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        index = [header.index(c) for c in columns]
+        for row in reader:
+            if len(row) != len(header):
+                continue
+            for c, i in zip(columns, index):
+                data[c].append(float(row[i]) if row[i] != "" else math.nan)
+    return data
+
+
+def aggregateResults(path: str, by: Iterable[str] = ("game", "game_kwargs", "graph", "graph_kwargs"),
+                     stats: Iterable[str] = ("move_count", "cardinality", "matching_count", "wall_time")
+                     ) -> Dict[Tuple, Dict[str, Any]]:
+    """
+    stream a result file and aggregate the given statistics per group
+    Return:
+        group key ( tuple of the `by` columns ) -> {"trials": count, "unsolved": count,
+        stat: RunningStats.summary()}, the statistics leave out the unsolved trials
+    """
+    by = list(by)
+    groups: Dict[Tuple, Dict[str, Any]] = {}
+    for record in iterRecords(path):
+        key = tuple(record.get(c) for c in by)
+        group = groups.setdefault(key, {"trials": 0, "unsolved": 0})
+        group["trials"] += 1
+        if _unsolved(record):
+            group["unsolved"] += 1
+            continue
+        for s in stats:
+            if s in record:
+                group.setdefault(s, RunningStats()).add(record[s])
+    return {key: {s: v.summary() if isinstance(v, RunningStats) else v for s, v in group.items()}
+            for key, group in groups.items()}
+
+
+def _unsolved(record: Record) -> bool:
+    """whether a trial stopped before an equilibrium ( its solver returned a non-converged SolveResult )"""
+    return record.get("status", SolveResult.CONVERGED) != SolveResult.CONVERGED
+
+
+class RunningStats:
+    """mean / standard deviation / min / max of a stream of numbers (Welford's algorithm)"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    def std(self) -> float:
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        return {"mean": self.mean, "std": self.std(), "min": self.min, "max": self.max}
+
+
+class CellResult:
+    """
+    aggregated statistics of the trials of one grid cell,
+    the unsolved trials are counted as invalid and left out of the statistics
+    """
+
+    STATS = ("move_count", "cardinality", "matching_count")
+
+    def __init__(self, cell: Cell) -> None:
+        self.cell = cell
+        self.trials = 0
+        self.invalid = 0
+        self.unsolved = 0
+        self.status: Dict[str, int] = {}
+        self.stats: Dict[str, RunningStats] = {}
+
+    def add(self, record: Record) -> None:
+        self.trials += 1
+        if not record.get("valid", True):
+            self.invalid += 1
+        if "status" in record:
+            self.status[record["status"]] = self.status.get(record["status"], 0) + 1
+        if _unsolved(record):
+            # result files written before unsolved trials were marked invalid lack "valid"
+            if record.get("valid", True):
+                self.invalid += 1
+            self.unsolved += 1
+            return
+        for key in self.STATS:
+            if key in record:
+                self.stats.setdefault(key, RunningStats()).add(record[key])
+
+    def summary(self) -> Dict[str, Any]:
+        summary = {
+            "game": self.cell["game"].__name__,
+            "game_kwargs": self.cell.get("game_kwargs", {}),
+            "graph": self.cell.get("graph", graph.randomWSGraph).__name__,
+            "graph_kwargs": self.cell["graph_kwargs"],
+            "trials": self.trials,
+            "invalid": self.invalid,
+            "unsolved": self.unsolved,
+        }
+        if self.status:
+            summary["status"] = self.status
+        for key, stats in self.stats.items():
+            summary[key] = stats.summary()
+        return summary
+
+
+def runSweep(grid: List[Cell], seed: int = 0, processes: Optional[int] = None,
+             chunk_size: int = 10, callback=None, output: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    run every trial of the grid on a process pool
+    Input:
+        - grid: list of cells, see module docstring
+        - seed: base seed of the sweep
+        - processes: number of worker processes (default: os.cpu_count()),
+            0 runs every trial in the current process
+        - chunk_size: number of trials sent to a worker at once
+        - callback: optional function called as callback(cell_index, record)
+            for each trial as soon as its result arrives
+        - output: optional path of a result CSV file, every trial is appended to it,
+            trials already in the file ( from an interrupted run of the same sweep )
+            are not run again but still count in the summaries
+    Return:
+        the summary of each cell ( in grid order )
+    """
+    results = [CellResult(cell) for cell in grid]
+    done = set()
+    # opening the writer first drops a partially written last line, which could otherwise be
+    # read back as a completed trial ( e.g. when it was cut inside its last field )
+    writer = ResultWriter(output) if output is not None else None
+    if writer is not None:
+        try:
+            for record in iterRecords(output):
+                cell_index, trial = record["cell"], record["trial"]
+                if cell_index >= len(grid) or record["seed"] != trialSeed(seed, cell_index, trial):
+                    raise ValueError(f"{output} contains results of a different sweep")
+                done.add((cell_index, trial))
+                results[cell_index].add(record)
+        except BaseException:
+            writer.close()
+            raise
+
+    chunks = []
+    for cell_index, cell in enumerate(grid):
+        trials = [(t, trialSeed(seed, cell_index, t)) for t in range(cell["trials"])
+                  if (cell_index, t) not in done]
+        for start in range(0, len(trials), chunk_size):
+            chunks.append((cell, cell_index, trials[start:start+chunk_size]))
+
+    def collect(records):
+        for record in records:
+            results[record["cell"]].add(record)
+            if writer:
+                writer.write(grid[record["cell"]], record)
+            if callback:
+                callback(record["cell"], record)
+
+    try:
+        if processes == 0:
+            for chunk in chunks:
+                collect(_runChunk(*chunk))
+        else:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("fork" if "fork" in methods else None)
+            with ProcessPoolExecutor(max_workers=processes or os.cpu_count(), mp_context=context) as pool:
+                futures = [pool.submit(_runChunk, *chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    collect(future.result())
+    finally:
+        if writer:
+            writer.close()
+    return [r.summary() for r in results]
+
+
+if __name__ == '__main__':
+    import argparse
+    from graph_games import K_DominationGame, AsymmetricIDSGame, MaximalMatchingGame
+
+    parser = argparse.ArgumentParser(description="rewiring-probability sweeps in parallel")
+    parser.add_argument("--trials", type=int, default=100)
+    parser.add_argument("--n", type=int, default=30)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="stream per-trial results to this CSV file")
+    args = parser.parse_args()
+
+    games = [
+        {"game": K_DominationGame, "game_kwargs": {"k": 2}},
+        {"game": AsymmetricIDSGame},
+    ] + [
+        {"game": MaximalMatchingGame, "random_init": True,
+         "game_kwargs": {"deg_penalty": d, "robbing_reward": r}}
+        for d, r in [(False, False), (True, False), (True, True)]
+    ]
+    grid = makeGrid(games, [p / 10 for p in range(0, 10, 2)],
+                    n=args.n, trials=args.trials)
+    print(f'{"game":20}, {"game_kwargs":50}, {"rewiring_prob":15}, {"move_counts per node":20}, {"cardinality/matching":20}')
+    for s in runSweep(grid, seed=args.seed, processes=args.processes, output=args.output):
+        size = s.get("cardinality", s.get("matching_count"))
+        print(f'{s["game"]:20}, {str(s["game_kwargs"]):50}, {s["graph_kwargs"]["link_rewiring_prob"]:15.2f}, '
+              f'{s["move_count"]["mean"] / args.n:20.2f}, {size["mean"]:20.2f}')
@@ -0,0 +1,83 @@
+"""CachedGame gives the same utilities, best responses and solver runs as the uncached game"""
+import random
+
+import pytest
+
+import graph
+from game_solver import bestResponseSolver, worklistSolver
+from graph_games import AsymmetricIDSGame, CachedGame, K_DominationGame, MaximalMatchingGame
+
+GAMES = {
+    "K_DominationGame": lambda g: K_DominationGame(2, g),
+    "AsymmetricIDSGame": AsymmetricIDSGame,
+    "MaximalMatchingGame": MaximalMatchingGame,
+}
+
+
+def makeGame(name, seed, n=30):
+    random.seed(seed)
+    game = GAMES[name](graph.randomWSGraph(n, 4, 0.4))
+    game.randomInit()
+    return game
+
+
+def makePair(name, seed):
+    # two games on two equal graphs, a clone would share the graph
+    return makeGame(name, seed), CachedGame(makeGame(name, seed))
+
+
+def assertSame(game, cached):
+    for p in game.getPlayers():
+        assert cached.getUtil(p) == game.getUtil(p)
+        assert cached.bestResponse(p) == game.bestResponse(p)
+    assert cached.checkCache()
+
+
+@pytest.mark.parametrize("name", GAMES)
+@pytest.mark.parametrize("seed", range(10))
+def test_random_moves(name, seed):
+    game, cached = makePair(name, seed)
+    players = sorted(game.getPlayers())
+    rng = random.Random(seed)
+    assertSame(game, cached)
+    for step in range(200):
+        p = rng.choice(players)
+        action = rng.choice(list(game.iterPossibleActions(p)))
+        game.setAction(p, action)
+        cached.setAction(p, action)
+        if step % 20 == 0:
+            assertSame(game, cached)
+    assertSame(game, cached)
+
+
+@pytest.mark.parametrize("name", GAMES)
+@pytest.mark.parametrize("seed", range(5))
+def test_churn(name, seed):
+    game, cached = makePair(name, seed)
+    players = sorted(game.getPlayers())
+    rng = random.Random(seed)
+    for _ in range(30):
+        p, q = rng.sample(players, 2)
+        if q in game.graph.neighbors(p):
+            game.removeEdge(p, q)
+            cached.removeEdge(p, q)
+        else:
+            game.addEdge(p, q)
+            cached.addEdge(p, q)
+        p = rng.choice(players)
+        action = rng.choice(list(game.iterPossibleActions(p)))
+        game.setAction(p, action)
+        cached.setAction(p, action)
+        assertSame(game, cached)
+
+
+@pytest.mark.parametrize("name", GAMES)
+@pytest.mark.parametrize("solver", [bestResponseSolver, worklistSolver])
+def test_solve(name, solver):
+    for seed in range(5):
+        game, cached = makePair(name, seed)
+        random.seed(seed)
+        iterations = game.solve(solver)
+        random.seed(seed)
+        assert cached.solve(solver) == iterations
+        assert cached.getProfile() == game.getProfile()
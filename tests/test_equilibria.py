@@ -0,0 +1,68 @@
+"""the pruned searches of equilibria.py agree with a brute force over every profile of small games"""
+import itertools
+import random
+
+import pytest
+
+import graph
+from equilibria import enumerateEquilibria, extremeProfiles, isBestResponding, socialObjective
+from graph_games import AsymmetricIDSGame, K_DominationGame, MaximalMatchingGame
+
+GAMES = {
+    "K_DominationGame": lambda g: K_DominationGame(2, g),
+    "AsymmetricIDSGame": AsymmetricIDSGame,
+    "MaximalMatchingGame": MaximalMatchingGame,
+}
+
+# (n, k) of the Watts-Strogatz graphs, small enough to enumerate every matching profile
+SIZES = [(5, 2), (5, 4), (6, 2), (6, 4), (7, 2), (8, 2)]
+
+
+def makeGame(name, n, k, seed):
+    rng = random.Random(seed)
+    return GAMES[name](graph.randomWSGraph(n, k, 0.4, rng=rng))
+
+
+def bruteForce(game):
+    """every equilibrium, and the smallest and largest objective over the equilibria and the feasible profiles"""
+    _, value, _, _, feasible = socialObjective(game)
+    players = sorted(game.getPlayers())
+    equilibria = []
+    values = {True: [], False: []}
+    for actions in itertools.product(*(list(game.iterPossibleActions(p)) for p in players)):
+        game.setProfile(dict(zip(players, actions)))
+        if all(feasible(p) for p in players):
+            values[False].append(value())
+        if all(isBestResponding(game, p) for p in players):
+            values[True].append(value())
+            equilibria.append(game.getProfile())
+    return equilibria, values
+
+
+def key(profile):
+    return tuple(sorted(profile.items(), key=lambda item: item[0]))
+
+
+@pytest.mark.parametrize("name", GAMES)
+@pytest.mark.parametrize("n, k", SIZES)
+@pytest.mark.parametrize("seed", range(3))
+def test_brute_force(name, n, k, seed):
+    game = makeGame(name, n, k, seed)
+    equilibria, values = bruteForce(game)
+    found = list(enumerateEquilibria(game))
+    assert len(found) == len(equilibria)
+    assert set(map(key, found)) == set(map(key, equilibria))
+
+    _, value, _, _, _ = socialObjective(game)
+    for equilibrium in (True, False):
+        (low, low_profile), (high, high_profile) = extremeProfiles(game, equilibrium)
+        if not values[equilibrium]:
+            assert low is None and high is None
+            continue
+        assert (low, high) == (min(values[equilibrium]), max(values[equilibrium]))
+        # the returned profiles attain the returned values
+        for target, profile in ((low, low_profile), (high, high_profile)):
+            game.setProfile(profile)
+            assert value() == target
+            if equilibrium:
+                assert key(profile) in set(map(key, equilibria))